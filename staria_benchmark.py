@@ -0,0 +1,514 @@
+"""Headless benchmarks for Staria Video Player hot paths
+
+Test videos are generated locally with cv2.VideoWriter, so no display and no
+sample media are needed.
+
+Usage:
+    python staria_benchmark.py                          # run every benchmark
+    python staria_benchmark.py decode render            # run selected benchmarks
+    python staria_benchmark.py --json results.json      # also write machine-readable results
+    python staria_benchmark.py startup --check          # exit with status 1 if a startup budget is missed
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tempfile
+import threading
+import wave
+import cv2
+import numpy as np
+
+from staria_video_player import (
+    AudioEngine,
+    AudioExtractor,
+    FrameDecoder,
+    FrameIndex,
+    FrameRenderer,
+    PlaybackEngine,
+    StartupProfile,
+    TimeStretcher,
+)
+
+SPEEDS = [0.25, 0.5, 0.75, 1.25, 1.5, 2.0]
+CHANNEL_LAYOUTS = {'mono': 1, 'stereo': 2, '5.1': 6}
+
+# Test video matrix
+RESOLUTIONS = {'360p': (640, 360), '720p': (1280, 720), '1080p': (1920, 1080)}
+GOP_LENGTHS = [12, 60]
+VIDEO_SECONDS = 10
+VIDEO_FPS = 25
+
+# Default canvas size of the player window, for the render benchmark
+CANVAS_SIZE = (880, 450)
+
+
+def make_test_video(directory, width, height, gop=12, audio=False, seconds=VIDEO_SECONDS, fps=VIDEO_FPS):
+    """Write a synthetic video with a moving gradient and the frame number burned in
+
+    cv2.VideoWriter writes MPEG-4 with 12-frame GOPs and no sound. Other GOP
+    lengths and the stereo test tone are added by re-encoding with the ffmpeg
+    binary that moviepy installs. Files are reused within a directory.
+    """
+    base = os.path.join(directory, f"test_{width}x{height}_{seconds}s.mp4")
+    if not os.path.exists(base):
+        writer = cv2.VideoWriter(base, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        ramp = np.linspace(0, 255, width, dtype=np.uint8)
+        scale = height / 180
+        for i in range(int(seconds * fps)):
+            frame = np.empty((height, width, 3), dtype=np.uint8)
+            frame[:] = np.roll(ramp, i * 4)[None, :, None]
+            cv2.putText(frame, str(i), (10, int(40 * scale)), cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255), max(1, int(2 * scale)))
+            writer.write(frame)
+        writer.release()
+
+    if gop == 12 and not audio:
+        return base
+
+    path = os.path.join(directory, f"test_{width}x{height}_{seconds}s_gop{gop}{'_audio' if audio else ''}.mp4")
+    if os.path.exists(path):
+        return path
+
+    from imageio_ffmpeg import get_ffmpeg_exe
+    command = [get_ffmpeg_exe(), '-y', '-loglevel', 'error', '-i', base]
+    if audio:
+        tone = os.path.join(directory, f"tone_{seconds}s.wav")
+        write_test_tone(tone, seconds)
+        command += ['-i', tone, '-c:a', 'aac', '-shortest']
+    if gop == 12:
+        command += ['-c:v', 'copy']
+    else:
+        command += ['-c:v', 'mpeg4', '-q:v', '3', '-g', str(gop)]
+    subprocess.run(command + [path], check=True)
+    return path
+
+
+def write_test_tone(path, seconds, sample_rate=44100):
+    """Write a 440/660 Hz stereo tone as 16-bit WAV"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    samples = np.stack([np.sin(2 * np.pi * 440 * t), np.sin(2 * np.pi * 660 * t)], axis=1)
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes((samples * 0.5 * 32767).astype(np.int16).tobytes())
+
+
+def build_index(path, fps=VIDEO_FPS):
+    """Build the keyframe/timestamp index and wait for it"""
+    ready = threading.Event()
+    index = FrameIndex(path, fps, ready.set)
+    ready.wait(60)
+    return index
+
+
+def summarize(times):
+    """Median, 95th percentile and max of a list of millisecond timings"""
+    times = np.array(times, dtype=np.float64)
+    return {
+        'median_ms': float(np.nanmedian(times)),
+        'p95_ms': float(np.nanpercentile(times, 95)),
+        'max_ms': float(np.nanmax(times)),
+    }
+
+
+def benchmark_decode(seeks=20, steps=20):
+    """Measure sequential decode rate, random seek latency and backward step latency
+
+    Runs for every resolution and GOP length in the test matrix.
+    """
+    rng = np.random.default_rng(0)
+    results = []
+
+    print(f"Decoding {VIDEO_SECONDS}s test videos at {VIDEO_FPS} fps")
+    with tempfile.TemporaryDirectory(prefix="staria_bench_") as directory:
+        for resolution, (width, height) in RESOLUTIONS.items():
+            for gop in GOP_LENGTHS:
+                path = make_test_video(directory, width, height, gop)
+                index = build_index(path)
+                total = index.frame_count
+
+                # Sequential playback through the read-ahead buffer
+                decoder = FrameDecoder(path)
+                decoder.index = index
+                start = time.perf_counter()
+                for i in range(total):
+                    decoder.playhead = i
+                    decoder.get_frame(i)
+                decode_fps = total / (time.perf_counter() - start)
+
+                # Random seeks with an empty cache
+                seek_times = []
+                for target in rng.integers(0, total, seeks):
+                    decoder.cache.clear()
+                    start = time.perf_counter()
+                    decoder.get_frame(int(target))
+                    seek_times.append((time.perf_counter() - start) * 1000)
+
+                # Backward steps from the end of a GOP, the first one decodes the GOP
+                decoder.cache.clear()
+                position = min(total - 1, gop * 2 - 1 + steps)
+                decoder.get_frame(position)
+                step_times = []
+                for i in range(1, steps + 1):
+                    start = time.perf_counter()
+                    decoder.get_frame(position - i, backward=True)
+                    step_times.append((time.perf_counter() - start) * 1000)
+                decoder.close()
+
+                result = {
+                    'resolution': resolution,
+                    'gop': gop,
+                    'decode_fps': decode_fps,
+                    'seek': summarize(seek_times),
+                    'backward_step': summarize(step_times),
+                }
+                results.append(result)
+                print(f"  {resolution:<6} GOP {gop:<3} {decode_fps:7.0f} fps  "
+                      f"seek median {result['seek']['median_ms']:6.1f} ms  "
+                      f"step back median {result['backward_step']['median_ms']:6.2f} ms "
+                      f"(max {result['backward_step']['max_ms']:6.1f} ms)")
+
+    return results
+
+
+def benchmark_render(frames=50, repeats=3):
+    """Measure the per-frame cost of the render path (scale and color conversion) for the default canvas
+
+    This is the work show_frame does before handing the image to Tk; the
+    PhotoImage paste itself needs a display and is not included.
+    """
+    results = []
+
+    print(f"Rendering to a {CANVAS_SIZE[0]}x{CANVAS_SIZE[1]} canvas, best of {repeats}")
+    with tempfile.TemporaryDirectory(prefix="staria_bench_") as directory:
+        for resolution, (width, height) in RESOLUTIONS.items():
+            capture = cv2.VideoCapture(make_test_video(directory, width, height, seconds=2))
+            decoded = []
+            while len(decoded) < frames:
+                ret, frame = capture.read()
+                if not ret:
+                    break
+                decoded.append(frame)
+            capture.release()
+
+            renderer = FrameRenderer(None)
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                for frame in decoded:
+                    renderer.prepare(frame, CANVAS_SIZE)
+                best = min(best, (time.perf_counter() - start) / len(decoded))
+
+            results.append({'resolution': resolution, 'ms_per_frame': best * 1000})
+            print(f"  {resolution:<6} {best * 1000:6.2f} ms/frame")
+
+    return results
+
+
+def check_streamed_loop(store, play_seconds=2.5):
+    """Play a 1.5 s A-B loop streamed from the store (no loop cache) with nobody seeking back
+
+    The feeder must park at B instead of queueing the audio after it. Returns
+    (furthest source sample fed, B, parked), or None without an audio output.
+    """
+    try:
+        engine = AudioEngine(store)
+    except Exception as e:
+        print(f"  streamed loop skipped, no audio output: {e}")
+        return None
+
+    start, end = store.sample_rate // 2, store.sample_rate * 2
+    engine.set_loop(start, end)
+    engine.play(start / store.sample_rate, 1.0)
+    time.sleep(play_seconds)
+    furthest, parked = engine.position, engine.end_of_audio is not None
+    engine.close()
+    return furthest, end, parked
+
+
+def benchmark_audio(durations=(10, 60)):
+    """Measure audio extraction time to the first playable chunk and to completion
+
+    On the first file, also checks that a streamed A-B loop stops feeding at B.
+    """
+    results = []
+
+    print("Extracting AAC stereo test tones")
+    with tempfile.TemporaryDirectory(prefix="staria_bench_") as directory:
+        for seconds in durations:
+            path = make_test_video(directory, 320, 180, audio=True, seconds=seconds)
+            ready = {}
+            done = threading.Event()
+
+            start = time.perf_counter()
+            extractor = AudioExtractor(
+                path,
+                on_ready=lambda store: ready.setdefault('time', time.perf_counter()),
+                on_done=lambda store: done.set(),
+            )
+            done.wait(600)
+            elapsed = time.perf_counter() - start
+            loop = check_streamed_loop(extractor.store) if seconds == durations[0] else None
+            extractor.cancel()
+
+            result = {
+                'seconds': seconds,
+                'ready_s': ready.get('time', start) - start,
+                'complete_s': elapsed,
+                'realtime_factor': seconds / elapsed,
+            }
+            results.append(result)
+            print(f"  {seconds:>4}s  ready in {result['ready_s']:5.2f}s  complete in {elapsed:6.2f}s  ({result['realtime_factor']:5.0f}x real time)")
+
+            if loop is not None:
+                furthest, end, parked = loop
+                results.append({'operation': 'streamed_loop', 'furthest_sample': furthest, 'loop_end': end, 'ok': parked and furthest <= end})
+                print(f"  streamed loop fed up to sample {furthest} of B = {end}  {'ok' if results[-1]['ok'] else 'FAILED'}")
+
+    return results
+
+
+def benchmark_stretch(sample_rate=44100, seconds=2.0, block_seconds=0.1, repeats=3):
+    """Measure TimeStretcher.process throughput in source samples per second for each speed and channel layout
+
+    Input is fed in the same 0.1 s blocks the AudioEngine feeder uses, through
+    one stretcher per run so the carried-over state is included.
+    """
+    rng = np.random.default_rng(0)
+    n = int(sample_rate * seconds)
+    results = []
+
+    print(f"Time-stretching {seconds:g}s of audio in {block_seconds:g}s blocks at {sample_rate} Hz, best of {repeats}")
+    for speed in SPEEDS:
+        for layout, channels in CHANNEL_LAYOUTS.items():
+            audio = rng.standard_normal((n, channels)).astype(np.float32)
+            block = int(sample_rate * block_seconds * speed)
+
+            best = float('inf')
+            for _ in range(repeats):
+                stretcher = TimeStretcher(sample_rate, channels)
+                start = time.perf_counter()
+                for offset in range(0, n, block):
+                    stretcher.process(audio[offset:offset + block], speed)
+                best = min(best, time.perf_counter() - start)
+
+            rate = n / best
+            results.append({
+                'speed': speed,
+                'layout': layout,
+                'channels': channels,
+                'samples_per_sec': rate,
+            })
+            print(f"  {speed:>5}x  {layout:<7} {rate / 1e6:8.2f} M samples/s  ({rate / sample_rate:6.0f}x real time)")
+
+    return results
+
+
+def benchmark_engine(seeks=20, speed_changes=10, loop_seconds=3.0):
+    """Measure PlaybackEngine seek-to-first-frame and speed-change-to-first-frame latency
+
+    Then plays a one-second A-B loop and checks that the dropped-frame count,
+    kept the way the player keeps it, never goes negative across the wraps.
+    """
+    with tempfile.TemporaryDirectory(prefix="staria_bench_") as directory:
+        path = make_test_video(directory, 640, 360)
+        index = build_index(path)
+        decoder = FrameDecoder(path)
+        decoder.index = index
+        total = index.frame_count
+
+        state = {'frame': 0, 'presented': threading.Event(), 'time': 0.0}
+        stats = {'advanced': 0, 'presented': 0, 'wraps': 0}
+
+        def present(frame, deadline, backward=False, wrapped=False):
+            # Same accounting as VideoPlayer.present_frame
+            if deadline is not None:
+                stats['advanced'] += 1 if wrapped else frame - state['frame']
+                stats['presented'] += 1
+                stats['wraps'] += wrapped
+            if decoder.get_frame(frame, backward=backward) is not None:
+                state['frame'] = frame
+                state['time'] = time.perf_counter()
+                state['presented'].set()
+
+        engine = PlaybackEngine(
+            index.time_of,
+            index.frame_at,
+            lambda: total,
+            lambda: state['frame'],
+            present,
+        )
+
+        def measure(action):
+            state['presented'].clear()
+            start = time.perf_counter()
+            action()
+            if not state['presented'].wait(5):
+                return float('nan')
+            return (state['time'] - start) * 1000
+
+        print("Playback engine command latency")
+        rng = np.random.default_rng(0)
+        seek_times = [measure(lambda: engine.seek(int(f))) for f in rng.integers(0, total - VIDEO_FPS * 2, seeks)]
+
+        # A speed change takes effect as soon as the worker applies it, the next
+        # frame then follows at the new rate's frame interval
+        engine.resume()
+        speed_times = []
+        apply_times = []
+        for i in range(speed_changes):
+            speed = [0.5, 1.0, 2.0][i % 3]
+            speed_times.append(measure(lambda: engine.set_speed(speed)))
+            engine.wait_idle()
+            apply_times.append(engine.last_command_latency * 1000)
+        engine.pause()
+        engine.wait_idle()
+
+        engine.set_speed(1.0)
+        engine.seek(0)
+        engine.set_loop((0, VIDEO_FPS - 1))
+        engine.wait_idle()
+        stats.update(advanced=0, presented=0, wraps=0)
+        engine.resume()
+        time.sleep(loop_seconds)
+        engine.pause()
+        engine.wait_idle()
+        engine.close()
+        decoder.close()
+
+    results = []
+    for name, times in (('seek', seek_times), ('speed_apply', apply_times), ('speed_change', speed_times)):
+        result = {'operation': name, 'count': len(times)}
+        result.update(summarize(times))
+        results.append(result)
+        print(f"  {name:<13} median {result['median_ms']:6.1f} ms  p95 {result['p95_ms']:6.1f} ms  max {result['max_ms']:6.1f} ms")
+
+    dropped = stats['advanced'] - stats['presented']
+    results.append({'operation': 'loop', 'wraps': stats['wraps'], 'dropped_frames': dropped, 'ok': stats['wraps'] > 0 and dropped >= 0})
+    print(f"  {'loop':<13} {stats['wraps']} wraps, {dropped} dropped frames  {'ok' if results[-1]['ok'] else 'FAILED'}")
+
+    return results
+
+
+# Run in a fresh interpreter per sample, so module imports are measured cold
+STARTUP_SCRIPT = """
+import json, sys, threading
+import staria_video_player as player
+profile = player.StartupProfile()
+profile.mark('imported')
+ready = threading.Event()
+loader = player.VideoLoader(sys.argv[1], player.FrameDecoder, 64 * 1024 * 1024, on_ready=lambda loader: ready.set())
+ready.wait(30)
+profile.mark('first frame decoded')
+loader.discard()
+print(json.dumps({
+    'marks': dict(profile.marks),
+    'loaded': [name for name in ('moviepy.editor', 'sounddevice') if name in sys.modules],
+}))
+"""
+
+# Headless stand-ins for the StartupProfile budgets, the window itself needs a display
+STARTUP_BUDGETS = {
+    'imported': StartupProfile.BUDGET_MS['imported'],
+    'first frame decoded': StartupProfile.BUDGET_MS['first frame shown'],
+}
+
+
+def benchmark_startup(runs=5):
+    """Measure module import and time to the first decoded 1080p frame in fresh processes, against the startup budgets
+
+    Also checks that moviepy and sounddevice are not loaded by then.
+    The window needs a display; on a desktop, run
+    `python staria_video_player.py --profile-startup video.mp4` for the full timeline.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = {event: [] for event in STARTUP_BUDGETS}
+    loaded = set()
+
+    print(f"Cold start, best of {runs} fresh processes")
+    with tempfile.TemporaryDirectory(prefix="staria_bench_") as directory:
+        path = make_test_video(directory, 1920, 1080)
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, '-c', STARTUP_SCRIPT, path],
+                cwd=here, capture_output=True, text=True, check=True,
+            ).stdout
+            report = json.loads(output.strip().splitlines()[-1])
+            for event in samples:
+                samples[event].append(report['marks'][event])
+            loaded.update(report['loaded'])
+
+    results = []
+    for event, times in samples.items():
+        budget = STARTUP_BUDGETS[event]
+        result = {'event': event, 'best_ms': min(times), 'median_ms': float(np.median(times)), 'budget_ms': budget}
+        result['ok'] = result['best_ms'] <= budget
+        results.append(result)
+        print(f"  {event:<20} best {result['best_ms']:7.1f} ms  median {result['median_ms']:7.1f} ms  "
+              f"budget {budget} ms  {'ok' if result['ok'] else 'OVER'}")
+
+    results.append({'event': 'lazy imports', 'loaded_at_startup': sorted(loaded), 'ok': not loaded})
+    print(f"  {'lazy imports':<20} {'ok' if not loaded else 'loaded at startup: ' + ', '.join(sorted(loaded))}")
+
+    return results
+
+
+BENCHMARKS = {
+    'decode': benchmark_decode,
+    'render': benchmark_render,
+    'audio': benchmark_audio,
+    'stretch': benchmark_stretch,
+    'engine': benchmark_engine,
+    'startup': benchmark_startup,
+}
+
+
+def environment():
+    """Versions and machine details stored with the results"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Staria Video Player benchmarks")
+    parser.add_argument('names', nargs='*', help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--json', metavar='PATH', help="write results to a JSON file")
+    parser.add_argument('--check', action='store_true', help="exit with status 1 if any result misses its budget")
+    args = parser.parse_args()
+
+    names = args.names or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name} (choose from {', '.join(BENCHMARKS)})")
+            sys.exit(1)
+
+    results = {}
+    for name in names:
+        results[name] = BENCHMARKS[name]()
+        print()
+
+    if args.json:
+        report = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'environment': environment(),
+            'results': results,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    if args.check:
+        failed = [f"{name}: {result.get('event', result.get('operation', result))}" for name in results for result in results[name] if result.get('ok') is False]
+        for failure in failed:
+            print(f"Over budget: {failure}")
+        sys.exit(1 if failed else 0)
@@ -1,19 +1,2924 @@
+import time
+
+# Reference point for the startup profile, taken before the GUI and media libraries load
+MODULE_STARTED = time.perf_counter()
+
 import tkinter as tk
-from tkinter import filedialog, ttk
+from tkinter import filedialog, simpledialog, ttk
 import cv2
 from PIL import Image, ImageTk
 import threading
-import time
+import queue
+import multiprocessing
+from multiprocessing import shared_memory
 import os
+import sys
+import argparse
 import tempfile
-from moviepy.editor import VideoFileClip
+import json
+import csv
+import hashlib
+import shutil
 import numpy as np
-import sounddevice as sd
-from scipy import signal
-import wave
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class MediaCache:
+    """On-disk cache of data derived from media files (audio PCM, frame index, thumbnails), shared across sessions
+    
+    Each media file gets a directory named by a key built from its path, size,
+    modification time and a hash of a few sampled blocks. Files are written
+    under temporary names and renamed into place, so concurrent players never
+    read partial data. The total size is capped by evicting the least
+    recently used entries.
+    """
+    def __init__(self, directory=None, max_bytes=2 * 1024 * 1024 * 1024):
+        if directory is None:
+            base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+            directory = os.path.join(base, 'staria')
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+    
+    def key(self, path, sample_bytes=64 * 1024):
+        """File identity: path, size, mtime and the first, middle and last blocks of content"""
+        try:
+            info = os.stat(path)
+            digest = hashlib.sha1(f"{os.path.abspath(path)}|{info.st_size}|{info.st_mtime_ns}".encode())
+            with open(path, 'rb') as f:
+                for offset in (0, info.st_size // 2, max(0, info.st_size - sample_bytes)):
+                    f.seek(offset)
+                    digest.update(f.read(sample_bytes))
+            return digest.hexdigest()
+        except Exception as e:
+            print(f"Media cache error: {e}")
+            return None
+    
+    def entry(self, key):
+        return os.path.join(self.directory, key)
+    
+    def lookup(self, key, name):
+        """Path of a cached file, or None, and mark the entry as recently used"""
+        if key is None:
+            return None
+        path = os.path.join(self.entry(key), name)
+        if not os.path.exists(path):
+            return None
+        try:
+            os.utime(self.entry(key))
+        except OSError:
+            pass
+        return path
+    
+    def write(self, key, name, writer):
+        """Call writer(file) on a temp file in the entry and rename it into place"""
+        if key is None:
+            return
+        try:
+            entry = self.entry(key)
+            os.makedirs(entry, exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=entry, prefix=name + ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    writer(f)
+                os.replace(temp, os.path.join(entry, name))
+            except:
+                os.remove(temp)
+                raise
+            self.trim(keep=key)
+        except Exception as e:
+            print(f"Media cache error: {e}")
+    
+    def write_path(self, key, name, writer):
+        """Like write, for writers that need a file name: writer(path) gets a temp path with name's
+        extension and returns True when the file is complete, otherwise it is discarded
+        """
+        if key is None:
+            return
+        try:
+            entry = self.entry(key)
+            os.makedirs(entry, exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=entry, prefix=name + ".", suffix=".tmp" + os.path.splitext(name)[1])
+            os.close(fd)
+            try:
+                complete = writer(temp)
+            except:
+                os.remove(temp)
+                raise
+            if not complete:
+                os.remove(temp)
+                return
+            os.replace(temp, os.path.join(entry, name))
+            self.trim(keep=key)
+        except Exception as e:
+            print(f"Media cache error: {e}")
+    
+    def save_arrays(self, key, name, **arrays):
+        self.write(key, name, lambda f: np.savez(f, **arrays))
+    
+    def load_arrays(self, key, name):
+        path = self.lookup(key, name)
+        if path is None:
+            return None
+        try:
+            with np.load(path) as data:
+                return {k: data[k] for k in data.files}
+        except Exception as e:
+            print(f"Media cache error: {e}")
+            return None
+    
+    def save_json(self, key, name, value):
+        self.write(key, name, lambda f: f.write(json.dumps(value).encode()))
+    
+    def load_json(self, key, name):
+        path = self.lookup(key, name)
+        if path is None:
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Media cache error: {e}")
+            return None
+    
+    def save_file(self, key, name, source):
+        def copy(f):
+            with open(source, 'rb') as src:
+                shutil.copyfileobj(src, f, 1024 * 1024)
+        self.write(key, name, copy)
+    
+    def trim(self, keep=None):
+        """Delete least recently used entries until the cache fits max_bytes"""
+        with self.lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if not os.path.isdir(path):
+                    continue
+                size = 0
+                for root, _, files in os.walk(path):
+                    for file in files:
+                        try:
+                            size += os.path.getsize(os.path.join(root, file))
+                        except OSError:
+                            pass
+                entries.append((os.path.getmtime(path), name, size))
+                total += size
+            
+            for _, name, size in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if name == keep:
+                    continue
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+                total -= size
+
+
+class FrameIndex:
+    """Map frame number -> presentation timestamp -> preceding keyframe, built in one background pass"""
+    def __init__(self, path, fps, on_ready=None, cache=None, key=None):
+        self.path = path
+        self.fps = fps if fps and fps > 0 else 30
+        self.on_ready = on_ready
+        self.cache = cache
+        self.key = key
+        
+        # Presentation timestamps in seconds (relative to the first frame) and keyframe numbers
+        self.timestamps = None
+        self.keyframes = None
+        self.start_time = 0.0
+        self.ready = False
+        self.cancelled = False
+        
+        self.thread = threading.Thread(target=self.build)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def build(self):
+        """Walk the packets once without decoding and record timestamps and keyframe flags"""
+        try:
+            if self.load_cached():
+                return
+            
+            # Raw stream mode returns packets in decode order without decoding them
+            capture = cv2.VideoCapture(self.path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+            if not capture.isOpened():
+                return
+            
+            pts = []
+            key_packets = []
+            while not self.cancelled and capture.grab():
+                if capture.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                    key_packets.append(len(pts))
+                pts.append(capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+            capture.release()
+            
+            if self.cancelled or not pts:
+                return
+            
+            # Packets arrive in decode order, rank them by timestamp for presentation order
+            pts = np.array(pts, dtype=np.float64)
+            order = np.argsort(pts, kind='stable')
+            rank = np.empty(len(pts), dtype=np.int64)
+            rank[order] = np.arange(len(pts))
+            
+            self.start_time = pts[order[0]]
+            self.timestamps = pts[order] - self.start_time
+            if key_packets:
+                self.keyframes = np.sort(rank[key_packets])
+            else:
+                self.keyframes = np.array([0], dtype=np.int64)
+            self.ready = True
+            
+            if self.on_ready is not None:
+                self.on_ready()
+            
+            if self.cache is not None:
+                self.cache.save_arrays(
+                    self.key, 
+                    'index.npz', 
+                    timestamps=self.timestamps, 
+                    keyframes=self.keyframes, 
+                    start_time=np.array(self.start_time)
+                )
+        except Exception as e:
+            print(f"Frame index error: {e}")
+    
+    def load_cached(self):
+        """Take the index from the media cache if this file was indexed before"""
+        if self.cache is None:
+            return False
+        data = self.cache.load_arrays(self.key, 'index.npz')
+        if data is None:
+            return False
+        
+        self.timestamps = data['timestamps']
+        self.keyframes = data['keyframes']
+        self.start_time = float(data['start_time'])
+        self.ready = True
+        if self.on_ready is not None:
+            self.on_ready()
+        return True
+    
+    @property
+    def frame_count(self):
+        return len(self.timestamps)
+    
+    @property
+    def duration(self):
+        """Stream duration including the display time of the last frame"""
+        if len(self.timestamps) > 1:
+            return self.timestamps[-1] + (self.timestamps[-1] - self.timestamps[-2])
+        return 1.0 / self.fps
+    
+    def time_of(self, frame):
+        """Presentation time of a frame in seconds"""
+        frame = max(0, min(int(frame), len(self.timestamps) - 1))
+        return float(self.timestamps[frame])
+    
+    def frame_at(self, seconds):
+        """Frame being displayed at the given time"""
+        frame = int(np.searchsorted(self.timestamps, seconds, side='right')) - 1
+        return max(0, min(frame, len(self.timestamps) - 1))
+    
+    def keyframe_before(self, frame):
+        """Nearest keyframe at or before the given frame"""
+        pos = int(np.searchsorted(self.keyframes, frame, side='right')) - 1
+        return int(self.keyframes[max(0, pos)])
+    
+    def cancel(self):
+        self.cancelled = True
+
+
+class FrameCache:
+    """Memory-capped LRU cache of decoded frames keyed by frame index"""
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+    
+    def get(self, index):
+        """Return a cached frame and count the lookup as a hit or miss"""
+        with self.lock:
+            frame = self.frames.get(index)
+            if frame is None:
+                self.misses += 1
+                return None
+            self.frames.move_to_end(index)
+            self.hits += 1
+            return frame
+    
+    def peek(self, index):
+        """Return a cached frame without touching counters or LRU order"""
+        with self.lock:
+            return self.frames.get(index)
+    
+    def put(self, index, frame):
+        if frame.nbytes > self.max_bytes:
+            return
+        
+        with self.lock:
+            old = self.frames.pop(index, None)
+            if old is not None:
+                self.size -= old.nbytes
+            self.frames[index] = frame
+            self.size += frame.nbytes
+            self.evict()
+    
+    def evict(self):
+        """Drop least recently used frames until under budget, must be called with the lock held"""
+        while self.size > self.max_bytes and self.frames:
+            _, frame = self.frames.popitem(last=False)
+            self.size -= frame.nbytes
+    
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+            self.size = 0
+    
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'frames': len(self.frames),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+class FrameDecoder:
+    """Decode frames in order on a background thread into a bounded ring buffer"""
+    DEFAULT_CAPACITY = 32
+    
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, cache_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.capacity = capacity
+        self.buffer = deque()
+        self.cond = threading.Condition()
+        
+        # Recently shown frames and whole GOPs decoded for backward stepping
+        self.cache = FrameCache(cache_bytes)
+        
+        # Decoder position and pending seek request
+        self.next_index = 0
+        self.seek_target = None
+        self.fill_gop = False
+        self.end_of_stream = False
+        self.stopped = False
+        
+        # Last frame handed out, so redraws of the same frame don't seek
+        self.last_index = None
+        self.last_frame = None
+        
+        # Frame being presented, frames before it are skipped with grab() only
+        self.playhead = 0
+        
+        # Counters
+        self.frames_decoded = 0
+        self.frames_skipped = 0
+        self.seek_count = 0
+        
+        # Keyframe index, attached once it has been built
+        self.index = None
+        
+        # Optional StageMetrics receiving per-frame decode times
+        self.metrics = None
+        
+        self.capture = cv2.VideoCapture(path)
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def run(self):
+        """Decoder loop: seek only when requested, otherwise read ahead until the buffer is full"""
+        while True:
+            with self.cond:
+                while not self.stopped and self.seek_target is None and (
+                        len(self.buffer) >= self.capacity or self.end_of_stream):
+                    self.cond.wait()
+                
+                if self.stopped:
+                    break
+                
+                do_seek = self.seek_target is not None
+                fill_gop = do_seek and self.fill_gop
+                if do_seek:
+                    self.next_index = self.seek_target
+                    self.seek_target = None
+                    self.fill_gop = False
+                    self.buffer.clear()
+                    self.end_of_stream = False
+                index = self.next_index
+                
+                # Already behind the presentation, don't pay for retrieve and conversion
+                skip = not do_seek and index < self.playhead
+            
+            try:
+                if fill_gop and self.decode_gop(index):
+                    # The capture now sits right after index, keep reading ahead from there
+                    with self.cond:
+                        if self.seek_target is None:
+                            self.next_index = index + 1
+                        self.cond.notify_all()
+                    continue
+                
+                if do_seek:
+                    self.seek(index)
+                if skip:
+                    ret, frame = self.capture.grab(), None
+                else:
+                    started = time.perf_counter()
+                    ret, frame = self.capture.read()
+                    if self.metrics is not None:
+                        self.metrics.record('decode_ms', (time.perf_counter() - started) * 1000)
+            except Exception as e:
+                print(f"Decode error: {e}")
+                ret, frame = False, None
+            
+            with self.cond:
+                # A seek arrived while decoding, this frame is stale
+                if self.seek_target is not None:
+                    continue
+                
+                if ret and skip:
+                    self.next_index = index + 1
+                    self.frames_skipped += 1
+                elif ret:
+                    self.buffer.append((index, frame))
+                    self.next_index = index + 1
+                    self.frames_decoded += 1
+                else:
+                    self.end_of_stream = True
+                self.cond.notify_all()
+        
+        self.capture.release()
+    
+    def seek(self, index):
+        """Jump to the keyframe before index and decode forward to it"""
+        self.seek_count += 1
+        if self.index is None or not self.index.ready:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+            return
+        
+        keyframe = self.index.keyframe_before(index)
+        key_time = self.index.start_time + self.index.time_of(keyframe)
+        self.capture.set(cv2.CAP_PROP_POS_MSEC, key_time * 1000.0)
+        
+        # Bounded by the GOP length
+        for _ in range(index - keyframe):
+            if not self.capture.grab():
+                break
+    
+    def decode_gop(self, index):
+        """Decode from the keyframe before index up to index into the cache"""
+        keyframe = self.index.keyframe_before(index)
+        key_time = self.index.start_time + self.index.time_of(keyframe)
+        self.seek_count += 1
+        self.capture.set(cv2.CAP_PROP_POS_MSEC, key_time * 1000.0)
+        
+        for i in range(keyframe, index + 1):
+            # Give up on the GOP if the playhead jumped elsewhere
+            if self.seek_target is not None or self.stopped:
+                return True
+            
+            ret, frame = self.capture.read()
+            if not ret:
+                return False
+            self.frames_decoded += 1
+            self.cache.put(i, frame)
+            
+            with self.cond:
+                self.cond.notify_all()
+        
+        return self.cache.peek(index) is not None
+    
+    def request_seek(self, index, fill_gop=False):
+        """Ask the decoder to reposition, must be called with the lock held"""
+        self.seek_target = index
+        self.playhead = index
+        self.fill_gop = fill_gop
+        self.buffer.clear()
+        self.end_of_stream = False
+        self.cond.notify_all()
+    
+    def get_frame(self, index, timeout=2.0, backward=False):
+        """Return the decoded frame at index, seeking only if it is outside the read-ahead window
+        
+        With backward=True a cache miss decodes the whole containing GOP once,
+        so the following backward steps are served from the cache.
+        """
+        with self.cond:
+            if index == self.last_index:
+                return self.last_frame
+            
+            # Frames behind the playhead will never be shown
+            while self.buffer and self.buffer[0][0] < index:
+                self.buffer.popleft()
+                self.cond.notify_all()
+            
+            if not (self.buffer and self.buffer[0][0] == index):
+                frame = self.cache.get(index)
+                if frame is not None:
+                    self.last_index, self.last_frame = index, frame
+                    return frame
+                
+                # Seek if the frame was already passed or is too far ahead to read through
+                position = self.seek_target if self.seek_target is not None else self.next_index
+                window_start = self.buffer[0][0] if self.buffer else position
+                if index < window_start or index > position + self.capacity:
+                    can_fill = backward and self.index is not None and self.index.ready
+                    self.request_seek(index, fill_gop=can_fill)
+            
+            deadline = time.time() + timeout
+            while True:
+                # Drop frames that were already in flight when the playhead moved past them
+                while self.buffer and self.buffer[0][0] < index:
+                    self.buffer.popleft()
+                    self.cond.notify_all()
+                if self.buffer and self.buffer[0][0] == index:
+                    break
+                
+                frame = self.cache.peek(index)
+                if frame is not None:
+                    self.last_index, self.last_frame = index, frame
+                    return frame
+                
+                if self.end_of_stream and self.seek_target is None and self.next_index <= index:
+                    return None
+                
+                remaining = deadline - time.time()
+                if remaining <= 0 or self.stopped:
+                    return None
+                self.cond.wait(remaining)
+            
+            self.last_index, self.last_frame = self.buffer.popleft()
+            self.cache.put(index, self.last_frame)
+            self.cond.notify_all()
+            return self.last_frame
+    
+    def occupancy(self):
+        """Return (buffered frames, capacity)"""
+        with self.cond:
+            return len(self.buffer), self.capacity
+    
+    def set_capacity(self, capacity):
+        """Change how far the decoder reads ahead"""
+        with self.cond:
+            self.capacity = capacity
+            self.cond.notify_all()
+    
+    def close(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+
+
+def process_context():
+    """Multiprocessing context for the decoder and proxy processes
+    
+    Spawn rather than fork: the player already runs threads when they start,
+    and a forked child would inherit their locks in whatever state they were.
+    """
+    return multiprocessing.get_context('spawn')
+
+
+def decode_worker(path, shm_name, slots, shape, capacity, inbox, outbox, playhead):
+    """Decoder process: read frames into free shared-memory slots and announce them by slot number
+    
+    At most capacity + 1 slots are in use at once, the buffered frames and the
+    one the UI holds; the rest of the ring is never touched until
+    ('capacity', n) raises the limit. inbox carries ('seek', generation,
+    index, fill_gop), ('free', slot), ('capacity', n), ('index', start_time,
+    timestamps, keyframes) and ('stop',). outbox carries
+    ('frame', generation, index, slot, to_cache, decode_ms) and ('end', generation).
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray((slots,) + shape, dtype=np.uint8, buffer=shm.buf)
+    capture = cv2.VideoCapture(path)
+    
+    free = list(range(slots))
+    in_use_limit = capacity + 1
+    generation = 0
+    next_index = 0
+    cache_until = -1
+    end_of_stream = False
+    index = None
+    
+    def seek_keyframe(target):
+        """Position the capture at the keyframe before target and return that keyframe"""
+        if index is None:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, target)
+            return target
+        start_time, timestamps, keyframes = index
+        pos = int(np.searchsorted(keyframes, target, side='right')) - 1
+        keyframe = int(keyframes[max(0, pos)])
+        capture.set(cv2.CAP_PROP_POS_MSEC, (start_time + float(timestamps[keyframe])) * 1000.0)
+        return keyframe
+    
+    try:
+        while True:
+            # Apply every pending message before decoding, wait when there is nothing to do
+            try:
+                message = inbox.get(block=end_of_stream or slots - len(free) >= in_use_limit)
+            except queue.Empty:
+                message = None
+            
+            if message is not None:
+                kind = message[0]
+                if kind == 'stop':
+                    break
+                elif kind == 'free':
+                    free.append(message[1])
+                elif kind == 'capacity':
+                    in_use_limit = message[1] + 1
+                elif kind == 'index':
+                    index = message[1:]
+                elif kind == 'seek':
+                    _, generation, target, fill_gop = message
+                    end_of_stream = False
+                    keyframe = seek_keyframe(target)
+                    if fill_gop and index is not None:
+                        # Decode the whole GOP, the frames up to target go to the cache
+                        next_index = keyframe
+                        cache_until = target
+                    else:
+                        for _ in range(target - keyframe):
+                            if not capture.grab():
+                                break
+                        next_index = target
+                        cache_until = -1
+                continue
+            
+            # Already behind the presentation, don't pay for retrieve and copy
+            if next_index < playhead.value and next_index > cache_until:
+                if capture.grab():
+                    next_index += 1
+                else:
+                    end_of_stream = True
+                    outbox.put(('end', generation))
+                continue
+            
+            started = time.perf_counter()
+            ret, frame = capture.read()
+            if not ret:
+                end_of_stream = True
+                outbox.put(('end', generation))
+                continue
+            decode_ms = (time.perf_counter() - started) * 1000
+            
+            slot = free.pop()
+            if frame.shape == shape:
+                frames[slot] = frame
+            else:
+                frames[slot] = cv2.resize(frame, (shape[1], shape[0]))
+            outbox.put(('frame', generation, next_index, slot, next_index <= cache_until, decode_ms))
+            next_index += 1
+    except Exception as e:
+        print(f"Decode process error: {e}")
+    finally:
+        capture.release()
+        del frames
+        shm.close()
+        outbox.put(('stopped',))
+
+
+class ProcessFrameDecoder:
+    """FrameDecoder running decode in a separate process, frames are handed over through shared memory
+    
+    Frames live in a shared-memory ring of fixed-size slots and only slot
+    numbers cross the process boundary, so get_frame returns a view into the
+    ring without copying. A returned frame stays valid until the next
+    get_frame call. Only GOPs decoded for backward stepping are copied into
+    the cache.
+    """
+    DEFAULT_CAPACITY = 6
+    
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, cache_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.capacity = capacity
+        self.buffer = deque()
+        self.cond = threading.Condition()
+        self.cache = FrameCache(cache_bytes)
+        
+        # Same state as FrameDecoder, positions refer to what the UI side has received
+        self.next_index = 0
+        self.seek_target = None
+        self.end_of_stream = False
+        self.stopped = False
+        self.last_index = None
+        self.last_frame = None
+        self.last_slot = None
+        self.generation = 0
+        
+        # Counters
+        self.frames_decoded = 0
+        self.frames_skipped = 0
+        self.seek_count = 0
+        
+        # Optional StageMetrics, decode times are measured in the decoder process
+        self.metrics = None
+        
+        probe = cv2.VideoCapture(path)
+        width = int(probe.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(probe.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        probe.release()
+        
+        # Read-ahead frames and the one handed out, frames are decoded outside the ring.
+        # The ring is sized for the full read-ahead so a smaller capacity (a preload)
+        # can grow later, the slots beyond it are never written and take no memory until then
+        self.slots = max(capacity, self.DEFAULT_CAPACITY) + 1
+        self.shape = (height, width, 3)
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slots * height * width * 3)
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+        
+        context = process_context()
+        self.inbox = context.Queue()
+        self.outbox = context.Queue()
+        self.shared_playhead = context.Value('i', 0, lock=False)
+        self._index = None
+        
+        self.process = context.Process(
+            target=decode_worker, 
+            args=(path, self.shm.name, self.slots, self.shape, capacity, self.inbox, self.outbox, self.shared_playhead)
+        )
+        self.process.daemon = True
+        self.process.start()
+        
+        self.thread = threading.Thread(target=self.receive)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    @property
+    def playhead(self):
+        return self.shared_playhead.value
+    
+    @playhead.setter
+    def playhead(self, frame):
+        self.shared_playhead.value = frame
+    
+    @property
+    def index(self):
+        return self._index
+    
+    @index.setter
+    def index(self, index):
+        """The decoder process gets its own copy of the keyframe table"""
+        self._index = index
+        if index is not None and index.ready:
+            self.inbox.put(('index', index.start_time, index.timestamps, index.keyframes))
+    
+    def receive(self):
+        """Collect slot announcements from the decoder process"""
+        while True:
+            message = self.outbox.get()
+            kind = message[0]
+            if kind == 'stopped':
+                break
+            
+            with self.cond:
+                if kind == 'end':
+                    if message[1] == self.generation:
+                        self.end_of_stream = True
+                elif kind == 'frame':
+                    _, generation, index, slot, to_cache, decode_ms = message
+                    if self.metrics is not None:
+                        self.metrics.record('decode_ms', decode_ms)
+                    if generation != self.generation or self.stopped:
+                        self.inbox.put(('free', slot))
+                        continue
+                    
+                    self.frames_skipped += max(0, index - self.next_index)
+                    self.next_index = index + 1
+                    self.seek_target = None
+                    self.frames_decoded += 1
+                    if to_cache:
+                        self.cache.put(index, self.frames[slot].copy())
+                        self.inbox.put(('free', slot))
+                    else:
+                        self.buffer.append((index, slot))
+                self.cond.notify_all()
+    
+    def release(self, slot):
+        """Give a slot back to the decoder process, must be called with the lock held"""
+        if slot != self.last_slot:
+            self.inbox.put(('free', slot))
+    
+    def request_seek(self, index, fill_gop=False):
+        """Ask the decoder process to reposition, must be called with the lock held"""
+        self.generation += 1
+        self.seek_count += 1
+        self.seek_target = index
+        self.next_index = index
+        self.playhead = index
+        while self.buffer:
+            self.release(self.buffer.popleft()[1])
+        self.end_of_stream = False
+        self.inbox.put(('seek', self.generation, index, fill_gop))
+        self.cond.notify_all()
+    
+    def get_frame(self, index, timeout=2.0, backward=False):
+        """Return the frame at index as a view into shared memory, seeking only outside the read-ahead window"""
+        with self.cond:
+            if index == self.last_index:
+                return self.last_frame
+            
+            while self.buffer and self.buffer[0][0] < index:
+                self.release(self.buffer.popleft()[1])
+            
+            if not (self.buffer and self.buffer[0][0] == index):
+                frame = self.cache.get(index)
+                if frame is not None:
+                    self.hand_out(index, frame, None)
+                    return frame
+                
+                position = self.seek_target if self.seek_target is not None else self.next_index
+                window_start = self.buffer[0][0] if self.buffer else position
+                if index < window_start or index > position + self.capacity:
+                    can_fill = backward and self.index is not None and self.index.ready
+                    self.request_seek(index, fill_gop=can_fill)
+            
+            deadline = time.time() + timeout
+            while True:
+                while self.buffer and self.buffer[0][0] < index:
+                    self.release(self.buffer.popleft()[1])
+                if self.buffer and self.buffer[0][0] == index:
+                    break
+                
+                frame = self.cache.peek(index)
+                if frame is not None:
+                    self.hand_out(index, frame, None)
+                    return frame
+                
+                if self.end_of_stream and self.next_index <= index:
+                    return None
+                
+                remaining = deadline - time.time()
+                if remaining <= 0 or self.stopped:
+                    return None
+                self.cond.wait(remaining)
+            
+            _, slot = self.buffer.popleft()
+            self.hand_out(index, self.frames[slot], slot)
+            return self.last_frame
+    
+    def set_capacity(self, capacity):
+        """Change the read-ahead window, limited by the slots allocated at start"""
+        with self.cond:
+            self.capacity = max(1, min(capacity, self.slots - 1))
+            self.inbox.put(('capacity', self.capacity))
+    
+    def hand_out(self, index, frame, slot):
+        """Make frame the current one and free the slot of the previous one"""
+        previous = self.last_slot
+        self.last_index, self.last_frame, self.last_slot = index, frame, slot
+        if previous is not None and previous != slot:
+            self.inbox.put(('free', previous))
+    
+    def occupancy(self):
+        """Return (buffered frames, capacity)"""
+        with self.cond:
+            return len(self.buffer), self.capacity
+    
+    def close(self):
+        with self.cond:
+            if self.stopped:
+                return
+            self.stopped = True
+            self.cond.notify_all()
+        
+        self.inbox.put(('stop',))
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.outbox.put(('stopped',))
+        self.thread.join(timeout=1.0)
+        
+        # Views into the ring must go before the mapping can be closed
+        self.last_frame = None
+        self.frames = None
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except Exception as e:
+            print(f"Shared memory error: {e}")
+
+
+def proxy_worker(path, out_path, width, gop, progress, cancelled):
+    """Proxy process: write a downscaled short-GOP MPEG-4 copy of path, one proxy frame per source frame
+    
+    progress receives the fraction written and is set to exactly 1.0 only
+    when the whole source was transcoded.
+    """
+    # Stay behind playback and the UI for CPU time
+    if hasattr(os, 'nice'):
+        os.nice(10)
+    
+    capture = cv2.VideoCapture(path, cv2.CAP_ANY, [cv2.CAP_PROP_N_THREADS, 1])
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30
+    total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    src_w = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    src_h = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    size = (width, max(2, int(round(src_h * width / src_w / 2)) * 2))
+    
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    if hasattr(cv2, 'VIDEOWRITER_PROP_KEY_INTERVAL'):
+        writer = cv2.VideoWriter(out_path, cv2.CAP_FFMPEG, fourcc, fps, size, [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, gop])
+    else:
+        # Older OpenCV writes MPEG-4 with 12-frame GOPs
+        writer = cv2.VideoWriter(out_path, fourcc, fps, size)
+    if not writer.isOpened():
+        print(f"Proxy error: cannot write {out_path}")
+        return
+    
+    written = 0
+    resized = np.empty((size[1], size[0], 3), dtype=np.uint8)
+    while not cancelled.is_set():
+        ret, frame = capture.read()
+        if not ret:
+            break
+        writer.write(cv2.resize(frame, size, dst=resized, interpolation=cv2.INTER_AREA))
+        written += 1
+        if total > 0:
+            progress.value = min(written / total, 0.999)
+    
+    writer.release()
+    capture.release()
+    if not cancelled.is_set() and written > 0:
+        progress.value = 1.0
+
+
+class ProxyBuilder:
+    """Transcode a low-resolution short-GOP copy of a video into the media cache in a background process
+    
+    Proxy frames correspond one to one with source frames, so playback can
+    switch between the two at the same frame index. A proxy already in the
+    cache is used straight away.
+    """
+    def __init__(self, path, cache, key, width=640, gop=12, on_ready=None):
+        self.path = path
+        self.cache = cache
+        self.key = key
+        self.width = width
+        self.gop = gop
+        self.on_ready = on_ready
+        self.name = f"proxy_{width}.mp4"
+        self.proxy_path = None
+        self.ready = False
+        
+        self.context = process_context()
+        self.progress = self.context.Value('d', 0.0, lock=False)
+        self.cancelled = self.context.Event()
+        self.process = None
+        
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def run(self):
+        try:
+            self.proxy_path = self.cache.lookup(self.key, self.name)
+            if self.proxy_path is None:
+                self.cache.write_path(self.key, self.name, self.transcode)
+                self.proxy_path = self.cache.lookup(self.key, self.name)
+            if self.proxy_path is None or self.cancelled.is_set():
+                return
+            
+            self.progress.value = 1.0
+            self.ready = True
+            if self.on_ready is not None:
+                self.on_ready(self)
+        except Exception as e:
+            print(f"Proxy error: {e}")
+    
+    def transcode(self, temp):
+        self.process = self.context.Process(
+            target=proxy_worker, 
+            args=(self.path, temp, self.width, self.gop, self.progress, self.cancelled)
+        )
+        self.process.daemon = True
+        self.process.start()
+        self.process.join()
+        return self.process.exitcode == 0 and self.progress.value == 1.0
+    
+    def cancel(self):
+        self.cancelled.set()
+
+
+class FrameExporter:
+    """Save every step-th frame of a range to image files in one sequential decoding pass
+    
+    The range is decoded in order after a single seek, frames in between are
+    skipped with grab() only, and encoding runs on a thread pool since
+    cv2.imwrite releases the GIL. Files are named <prefix>_<frame>.<ext>, the
+    extension picks the format (png, jpg or bmp).
+    """
+    def __init__(self, path, prefix, extension, start, end, step=1, index=None, workers=None, on_progress=None, on_done=None):
+        self.path = path
+        self.prefix = prefix
+        self.extension = extension
+        self.start = start
+        self.end = end
+        self.step = max(1, step)
+        self.index = index
+        self.workers = workers or os.cpu_count() or 4
+        self.on_progress = on_progress
+        self.on_done = on_done
+        
+        self.total = len(range(start, end + 1, self.step))
+        self.written = 0
+        self.failed = 0
+        self.elapsed = 0.0
+        self.cancelled = False
+        
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    @property
+    def fps(self):
+        return self.written / self.elapsed if self.elapsed > 0 else 0.0
+    
+    def file_name(self, frame):
+        return f"{self.prefix}_{frame:06d}{self.extension}"
+    
+    def run(self):
+        capture = cv2.VideoCapture(self.path)
+        started = time.perf_counter()
+        
+        # Bound the frames waiting for encoding so memory stays flat on long ranges
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            self.seek(capture, self.start)
+            for frame in range(self.start, self.end + 1):
+                if self.cancelled:
+                    break
+                
+                if (frame - self.start) % self.step:
+                    if not capture.grab():
+                        break
+                    continue
+                
+                ret, image = capture.read()
+                if not ret:
+                    break
+                
+                while len(pending) >= 2 * self.workers:
+                    self.collect(pending.popleft(), started)
+                pending.append(executor.submit(cv2.imwrite, self.file_name(frame), image))
+            
+            while pending and not self.cancelled:
+                self.collect(pending.popleft(), started)
+        except Exception as e:
+            print(f"Frame export error: {e}")
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            capture.release()
+            self.elapsed = time.perf_counter() - started
+        
+        if self.on_done:
+            self.on_done(self)
+    
+    def seek(self, capture, frame):
+        """Jump to the keyframe before the first frame and decode forward to it"""
+        if self.index is None or not self.index.ready:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, frame)
+            return
+        
+        keyframe = self.index.keyframe_before(frame)
+        capture.set(cv2.CAP_PROP_POS_MSEC, (self.index.start_time + self.index.time_of(keyframe)) * 1000.0)
+        for _ in range(frame - keyframe):
+            if not capture.grab():
+                break
+    
+    def collect(self, future, started):
+        """Wait for one encode and report progress"""
+        if future.result():
+            self.written += 1
+        else:
+            self.failed += 1
+        self.elapsed = time.perf_counter() - started
+        if self.on_progress:
+            self.on_progress(self)
+    
+    def cancel(self):
+        self.cancelled = True
+
+
+class ThumbnailStrip:
+    """Downscaled preview frames at regular intervals, stored as one contiguous array"""
+    def __init__(self, path, total_frames, fps, interval=1.0, max_bytes=64 * 1024 * 1024, width=160, index=None, cache=None, key=None, frame_size=None):
+        self.path = path
+        self.index = index
+        self.cache = cache
+        self.key = key
+        self.cancelled = False
+        
+        # Probe the source size unless the caller already knows it
+        if frame_size is None:
+            capture = cv2.VideoCapture(path)
+            frame_size = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            capture.release()
+        src_w = frame_size[0] or width
+        src_h = frame_size[1] or width
+        
+        # Thumbnail size keeps the source aspect ratio
+        self.width = min(width, src_w)
+        self.height = max(1, int(round(src_h * self.width / src_w)))
+        
+        # Widen the interval until the strip fits the memory budget
+        fps = fps if fps and fps > 0 else 30
+        step = max(1, int(round(interval * fps)))
+        thumb_bytes = self.width * self.height * 3
+        max_count = max(1, max_bytes // thumb_bytes)
+        count = max(1, (total_frames + step - 1) // step)
+        if count > max_count:
+            step = (total_frames + max_count - 1) // max_count
+            count = max(1, (total_frames + step - 1) // step)
+        
+        self.step = step
+        self.frames = np.arange(count, dtype=np.int64) * step
+        self.filled = np.zeros(count, dtype=bool)
+        self.thumbs = np.zeros((count, self.height, self.width, 3), dtype=np.uint8)
+        self.cache_name = f"thumbs_{self.width}x{self.height}_{count}x{step}.npz"
+        
+        self.thread = threading.Thread(target=self.build)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def build(self):
+        """Seek to each sample point and store a downscaled RGB copy"""
+        try:
+            if self.load_cached():
+                return
+            
+            capture = cv2.VideoCapture(self.path)
+            for i, frame_number in enumerate(self.frames):
+                if self.cancelled:
+                    break
+                
+                # Prefer a nearby keyframe once the index exists, it decodes without run-up
+                target = int(frame_number)
+                if self.index is not None and self.index.ready:
+                    keyframe = self.index.keyframe_before(target)
+                    if target - keyframe < self.step // 2:
+                        target = keyframe
+                
+                capture.set(cv2.CAP_PROP_POS_FRAMES, target)
+                ret, frame = capture.read()
+                if not ret:
+                    continue
+                
+                small = cv2.resize(frame, (self.width, self.height), interpolation=cv2.INTER_AREA)
+                cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=self.thumbs[i])
+                self.frames[i] = target
+                self.filled[i] = True
+                
+                # Stay out of the way of the playback decoder
+                time.sleep(0.001)
+            capture.release()
+            
+            if self.cache is not None and not self.cancelled:
+                self.cache.save_arrays(self.key, self.cache_name, thumbs=self.thumbs, frames=self.frames, filled=self.filled)
+        except Exception as e:
+            print(f"Thumbnail error: {e}")
+    
+    def load_cached(self):
+        """Take the strip from the media cache if one with the same layout was built before"""
+        if self.cache is None:
+            return False
+        data = self.cache.load_arrays(self.key, self.cache_name)
+        if data is None or data['thumbs'].shape != self.thumbs.shape:
+            return False
+        
+        self.thumbs[:] = data['thumbs']
+        self.frames[:] = data['frames']
+        self.filled[:] = data['filled']
+        return True
+    
+    def nearest(self, frame):
+        """Return the closest available thumbnail to a frame, or None"""
+        i = min(len(self.frames) - 1, max(0, int(round(frame / self.step))))
+        if self.filled[i]:
+            return self.thumbs[i]
+        
+        # Search outward for the nearest finished thumbnail
+        for offset in range(1, 4):
+            for j in (i - offset, i + offset):
+                if 0 <= j < len(self.frames) and self.filled[j]:
+                    return self.thumbs[j]
+        return None
+    
+    @property
+    def nbytes(self):
+        return self.thumbs.nbytes
+    
+    def cancel(self):
+        self.cancelled = True
+
+
+class ShotDetector:
+    """Find shot boundaries in one background pass over a downscaled copy of the stream
+    
+    Frames are shrunk to a small thumbnail and compared in batches: a frame
+    starts a new shot when its color histogram differs from the previous
+    frame's by more than threshold (half the L1 distance, 0..1) and the
+    previous boundary is at least min_shot seconds back. The analysis sleeps
+    between batches to stay under max_cpu of one core. Per-frame scores and
+    boundaries are kept in the media cache.
+    """
+    def __init__(self, path, fps, threshold=0.35, min_shot=0.5, width=64, batch_frames=64, max_cpu=0.5, cache=None, key=None, on_done=None):
+        self.path = path
+        self.fps = fps if fps and fps > 0 else 30
+        self.threshold = threshold
+        self.min_gap = max(1, int(round(min_shot * self.fps)))
+        self.width = width
+        self.batch_frames = batch_frames
+        self.max_cpu = max_cpu
+        self.cache = cache
+        self.key = key
+        self.on_done = on_done
+        
+        # Frames where a new shot starts, sorted, and how far the analysis has got
+        self.boundaries = np.zeros(0, dtype=np.int64)
+        self.scores = np.zeros(0, dtype=np.float32)
+        self.analyzed = 0
+        self.total_frames = 0
+        self.ready = False
+        self.cancelled = False
+        self.cache_name = f"shots_{width}.npz"
+        
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def progress(self):
+        if self.ready:
+            return 1.0
+        return self.analyzed / self.total_frames if self.total_frames else 0.0
+    
+    def run(self):
+        try:
+            if self.load_cached():
+                return
+            
+            # One decoder thread, the playback decoder needs the rest
+            capture = cv2.VideoCapture(self.path, cv2.CAP_ANY, [cv2.CAP_PROP_N_THREADS, 1])
+            self.total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            src_w = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)) or self.width
+            src_h = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)) or self.width
+            size = (self.width, max(1, int(round(src_h * self.width / src_w))))
+            
+            scores = []
+            previous = None
+            batch = np.empty((self.batch_frames, size[1], size[0], 3), dtype=np.uint8)
+            while not self.cancelled:
+                started = time.perf_counter()
+                
+                n = 0
+                while n < self.batch_frames:
+                    ret, frame = capture.read()
+                    if not ret:
+                        break
+                    cv2.resize(frame, size, dst=batch[n], interpolation=cv2.INTER_AREA)
+                    n += 1
+                if n == 0:
+                    break
+                
+                histograms = self.histograms(batch[:n])
+                if previous is None:
+                    previous = histograms[:1]
+                diffs = 0.5 * np.abs(np.diff(np.concatenate((previous, histograms)), axis=0)).sum(axis=1)
+                previous = histograms[-1:]
+                scores.append(diffs.astype(np.float32))
+                self.add_boundaries(diffs, self.analyzed)
+                self.analyzed += n
+                
+                # Duty cycle: sleep so busy time stays under max_cpu
+                busy = time.perf_counter() - started
+                time.sleep(busy * (1.0 / self.max_cpu - 1.0))
+            capture.release()
+            
+            if self.cancelled:
+                return
+            self.scores = np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+            self.ready = True
+            if self.cache is not None:
+                self.cache.save_arrays(self.key, self.cache_name, scores=self.scores)
+            if self.on_done is not None:
+                self.on_done(self)
+        except Exception as e:
+            print(f"Shot detection error: {e}")
+    
+    def histograms(self, frames):
+        """16-bin per-channel color histograms of a batch, normalized to sum to 1 per frame"""
+        n = len(frames)
+        bins = (frames >> 4).reshape(n, -1, 3).astype(np.int64)
+        bins += np.arange(3) * 16
+        bins += (np.arange(n) * 48)[:, None, None]
+        counts = np.bincount(bins.ravel(), minlength=n * 48).reshape(n, 48)
+        return counts / (frames[0].size)
+    
+    def add_boundaries(self, diffs, offset):
+        """Append boundaries from one batch of scores, frame offset + i for diffs[i]"""
+        candidates = np.flatnonzero(diffs > self.threshold) + offset
+        found = []
+        last = int(self.boundaries[-1]) if len(self.boundaries) else -self.min_gap
+        for frame in candidates:
+            if frame > 0 and frame - last >= self.min_gap:
+                found.append(frame)
+                last = frame
+        if found:
+            self.boundaries = np.concatenate((self.boundaries, found))
+    
+    def load_cached(self):
+        """Take per-frame scores from the media cache and recompute boundaries for the current threshold"""
+        if self.cache is None:
+            return False
+        data = self.cache.load_arrays(self.key, self.cache_name)
+        if data is None:
+            return False
+        
+        self.scores = data['scores']
+        self.total_frames = self.analyzed = len(self.scores)
+        self.add_boundaries(self.scores, 0)
+        self.ready = True
+        if self.on_done is not None:
+            self.on_done(self)
+        return True
+    
+    def next_shot(self, frame):
+        """First boundary after frame, or None"""
+        boundaries = self.boundaries
+        i = int(np.searchsorted(boundaries, frame, side='right'))
+        return int(boundaries[i]) if i < len(boundaries) else None
+    
+    def previous_shot(self, frame):
+        """Last boundary before frame: the current shot's start, or the previous one when frame is a start"""
+        boundaries = self.boundaries
+        i = int(np.searchsorted(boundaries, frame, side='left')) - 1
+        return int(boundaries[i]) if i >= 0 else 0
+    
+    def cancel(self):
+        self.cancelled = True
+
+
+class LoopCache:
+    """Keep an A-B loop region in RAM: frames scaled for the canvas and audio stretched for the speed
+    
+    Frames are decoded once and stored as RGBA at the renderer's fitted size,
+    so showing one is a paste with no decode, resize or color conversion. The
+    region's audio is time-stretched once into a block the audio engine
+    repeats. A region whose frames do not fit in max_bytes is not cached (fits
+    is False) and the loop streams from the decoder; audio that would push
+    the total over the budget streams as well.
+    """
+    def __init__(self, path, first, last, canvas_size, target_size, index=None, speed=1.0, max_bytes=256 * 1024 * 1024, on_ready=None):
+        self.path = path
+        self.first = first
+        self.last = last
+        self.canvas_size = canvas_size
+        self.target_size = target_size
+        self.index = index
+        self.speed = speed
+        self.max_bytes = max_bytes
+        self.on_ready = on_ready
+        
+        w, h = target_size
+        self.frame_count = last - first + 1
+        self.frame_bytes = self.frame_count * w * h * 4
+        self.fits = self.frame_bytes <= max_bytes
+        self.frames = None
+        self.decoded = 0
+        self.cancelled = False
+        
+        # Stretched loop audio for audio_speed; (store, start sample, end sample) it is cut from
+        self.audio = None
+        self.audio_speed = None
+        self.audio_source = None
+        self.audio_generation = 0
+        
+        if self.fits:
+            self.frames = np.empty((self.frame_count, h, w, 4), dtype=np.uint8)
+            thread = threading.Thread(target=self.build_frames)
+            thread.daemon = True
+            thread.start()
+    
+    @property
+    def ready(self):
+        return self.fits and self.decoded == self.frame_count
+    
+    @property
+    def nbytes(self):
+        audio_bytes = self.audio.nbytes if self.audio is not None else 0
+        return (self.frame_bytes if self.fits else 0) + audio_bytes
+    
+    def get(self, frame, canvas_size):
+        """RGBA frame if it is in the loop, already decoded and scaled for canvas_size, else None"""
+        i = frame - self.first
+        if canvas_size != self.canvas_size or not 0 <= i < self.decoded:
+            return None
+        return self.frames[i]
+    
+    def build_frames(self):
+        try:
+            capture = cv2.VideoCapture(self.path)
+            if self.index is not None and self.index.ready:
+                keyframe = self.index.keyframe_before(self.first)
+                capture.set(cv2.CAP_PROP_POS_MSEC, (self.index.start_time + self.index.time_of(keyframe)) * 1000.0)
+            else:
+                keyframe = self.first
+                capture.set(cv2.CAP_PROP_POS_FRAMES, self.first)
+            for _ in range(self.first - keyframe):
+                capture.grab()
+            
+            resized = np.empty((self.target_size[1], self.target_size[0], 3), dtype=np.uint8)
+            while self.decoded < self.frame_count and not self.cancelled:
+                ret, frame = capture.read()
+                if not ret:
+                    break
+                small = cv2.resize(frame, self.target_size, dst=resized, interpolation=cv2.INTER_LINEAR)
+                cv2.cvtColor(small, cv2.COLOR_BGR2RGBA, dst=self.frames[self.decoded])
+                self.decoded += 1
+            capture.release()
+            
+            # A short file may end early, the rest of the loop is never shown
+            self.frame_count = self.decoded
+            if not self.cancelled and self.on_ready is not None:
+                self.on_ready(self)
+        except Exception as e:
+            print(f"Loop cache error: {e}")
+    
+    def set_audio(self, store, start, end):
+        """Cut source samples start..end out of the store and stretch them for the current speed"""
+        self.audio_source = (store, start, end)
+        self.stretch(self.speed)
+    
+    def set_speed(self, speed):
+        self.speed = speed
+        if self.audio_source is not None and speed != self.audio_speed:
+            self.stretch(speed)
+    
+    def stretch(self, speed):
+        self.audio_generation += 1
+        self.audio = None
+        self.audio_speed = None
+        thread = threading.Thread(target=self.build_audio, args=(self.audio_generation, speed))
+        thread.daemon = True
+        thread.start()
+    
+    def build_audio(self, generation, speed):
+        try:
+            store, start, end = self.audio_source
+            count = end - start
+            out_count = int(count / speed)
+            if count <= 0 or (self.frame_bytes if self.fits else 0) + out_count * store.channels * 4 > self.max_bytes:
+                return
+            
+            # The extractor may still be decoding this part of the soundtrack
+            store.request(start)
+            while not store.wait_for(start, count, timeout=0.1):
+                if self.cancelled or generation != self.audio_generation:
+                    return
+            block = store.read(start, end).reshape(count, -1)
+            
+            if speed != 1.0:
+                # Stretch the region followed by its own start, so the last grains have input to finish on
+                stretcher = TimeStretcher(store.sample_rate, store.channels)
+                tail = block[:min(count, stretcher.frame * 2)]
+                stretched = stretcher.process(np.concatenate((block, tail)), speed)
+                block = np.zeros((out_count, store.channels), dtype=np.float32)
+                n = min(out_count, len(stretched))
+                block[:n] = stretched[:n]
+            
+            if self.cancelled or generation != self.audio_generation:
+                return
+            self.audio = np.ascontiguousarray(block, dtype=np.float32)
+            self.audio_speed = speed
+            if self.on_ready is not None:
+                self.on_ready(self)
+        except Exception as e:
+            print(f"Loop audio error: {e}")
+    
+    def cancel(self):
+        self.cancelled = True
+
+
+class AudioStore:
+    """Disk-backed int16 PCM store that a background producer fills one chunk at a time
+    
+    Samples stay in a memory-mapped temp file in their native int16 layout,
+    only the blocks being read are converted to float32. Given the path of
+    a complete PCM file (from the media cache), the store maps it read-only
+    and leaves it in place on close.
+    """
+    def __init__(self, total_samples, channels, sample_rate, chunk_duration=1.0, path=None):
+        self.total_samples = total_samples
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.chunk_samples = max(1, int(chunk_duration * sample_rate))
+        n_chunks = (total_samples + self.chunk_samples - 1) // self.chunk_samples
+        
+        if path is None:
+            # Unique file per store so several players don't overwrite each other
+            fd, self.path = tempfile.mkstemp(prefix="staria_audio_", suffix=".pcm")
+            os.close(fd)
+            self.owns_file = True
+            self.data = np.memmap(self.path, dtype=np.int16, mode='w+', shape=(max(1, total_samples), channels))
+        else:
+            self.path = path
+            self.owns_file = False
+            self.data = np.memmap(path, dtype=np.int16, mode='r', shape=(max(1, total_samples), channels))
+        
+        # Which chunks have been decoded, and where playback wants data next
+        self.filled = np.full(n_chunks, path is not None, dtype=bool)
+        self.priority_chunk = 0
+        self.cond = threading.Condition()
+    
+    def __len__(self):
+        return self.total_samples
+    
+    @property
+    def complete(self):
+        return bool(self.filled.all())
+    
+    def progress(self):
+        return float(self.filled.mean()) if len(self.filled) else 1.0
+    
+    def chunk_range(self, chunk):
+        start = chunk * self.chunk_samples
+        return start, min(start + self.chunk_samples, self.total_samples)
+    
+    def next_missing_chunk(self):
+        """First undecoded chunk at or after the playback position, wrapping around"""
+        missing = np.flatnonzero(~self.filled)
+        if len(missing) == 0:
+            return None
+        pos = np.searchsorted(missing, self.priority_chunk)
+        return int(missing[pos % len(missing)])
+    
+    def write_chunk(self, chunk, samples):
+        start, end = self.chunk_range(chunk)
+        samples = samples.reshape(len(samples), -1)[:end - start]
+        pcm = (np.clip(samples, -1.0, 32767 / 32768) * 32768).astype(np.int16)
+        with self.cond:
+            if self.data is None:
+                return
+            self.data[start:start + len(pcm)] = pcm
+            self.filled[chunk] = True
+            self.cond.notify_all()
+    
+    def request(self, sample):
+        """Ask the producer to decode around this sample next"""
+        self.priority_chunk = max(0, min(sample // self.chunk_samples, len(self.filled) - 1))
+    
+    def is_available(self, start, count):
+        if start >= self.total_samples:
+            return True
+        first = start // self.chunk_samples
+        last = (min(start + count, self.total_samples) - 1) // self.chunk_samples
+        return bool(self.filled[first:last + 1].all())
+    
+    def wait_for(self, start, count, timeout):
+        """Block until the range is decoded or the timeout expires"""
+        self.request(start)
+        with self.cond:
+            return self.cond.wait_for(lambda: self.is_available(start, count), timeout)
+    
+    def read_pcm(self, start, end):
+        """Copy a block of raw int16 samples, shape (samples, channels)"""
+        with self.cond:
+            if self.data is None:
+                raise ValueError("audio store is closed")
+            return np.array(self.data[start:end])
+    
+    def read(self, start, end=None):
+        """Convert a block to float32, 1-D for mono like the rest of the player expects"""
+        with self.cond:
+            if self.data is None:
+                raise ValueError("audio store is closed")
+            block = self.data[start:end].astype(np.float32)
+        block *= 1.0 / 32768
+        return block[:, 0] if self.channels == 1 else block
+    
+    def flush(self):
+        with self.cond:
+            if self.data is not None:
+                self.data.flush()
+    
+    def close(self):
+        """Unmap and delete the backing file unless it belongs to the media cache"""
+        with self.cond:
+            if self.data is None:
+                return
+            self.data._mmap.close()
+            self.data = None
+            self.cond.notify_all()
+        if not self.owns_file:
+            return
+        try:
+            os.remove(self.path)
+        except:
+            pass
+
+
+class PeakPyramid:
+    """Min/max waveform peaks at successively halved resolutions, filled in as the audio store is decoded
+    
+    Level 0 holds the min and max over all channels of every block_samples
+    samples, each level above halves the resolution. peaks() picks the
+    finest level with at most one bin per pixel, so drawing costs time in
+    proportion to the width in pixels, not to the number of samples.
+    """
+    def __init__(self, store, block_samples=256, on_update=None, batch_chunks=16):
+        self.store = store
+        self.block_samples = block_samples
+        self.on_update = on_update
+        self.batch_chunks = batch_chunks
+        
+        # (mins, maxs) int16 arrays per level, level 0 finest
+        self.levels = []
+        n = max(1, (store.total_samples + block_samples - 1) // block_samples)
+        while True:
+            self.levels.append((np.zeros(n, dtype=np.int16), np.zeros(n, dtype=np.int16)))
+            if n == 1:
+                break
+            n = (n + 1) // 2
+        
+        # Store chunks already reduced into the pyramid
+        self.done = np.zeros(len(store.filled), dtype=bool)
+        self.cancelled = False
+        
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    @property
+    def complete(self):
+        return bool(self.done.all())
+    
+    def run(self):
+        """Reduce newly decoded chunks as they arrive, in contiguous batches"""
+        store = self.store
+        try:
+            while not self.cancelled and not self.complete:
+                with store.cond:
+                    store.cond.wait_for(
+                        lambda: self.cancelled or store.data is None or (store.filled & ~self.done).any(), 
+                        timeout=0.5
+                    )
+                if self.cancelled or store.data is None:
+                    break
+                
+                new = np.flatnonzero(store.filled & ~self.done)
+                if len(new) == 0:
+                    continue
+                
+                # Split into runs of consecutive chunks, at most batch_chunks long
+                breaks = np.flatnonzero(np.diff(new) != 1) + 1
+                for run in np.split(new, breaks):
+                    for i in range(0, len(run), self.batch_chunks):
+                        batch = run[i:i + self.batch_chunks]
+                        start = store.chunk_range(int(batch[0]))[0]
+                        end = store.chunk_range(int(batch[-1]))[1]
+                        self.reduce(start, end)
+                        self.done[batch] = True
+                        if self.cancelled:
+                            return
+                
+                if self.on_update is not None:
+                    self.on_update(self)
+        except Exception as e:
+            print(f"Waveform error: {e}")
+    
+    def reduce(self, start, end):
+        """Recompute the level-0 bins overlapping [start, end) and propagate them up the pyramid"""
+        block = self.block_samples
+        b0 = start // block
+        b1 = (end + block - 1) // block
+        pcm = self.store.read_pcm(b0 * block, min(b1 * block, self.store.total_samples))
+        if len(pcm) == 0:
+            return
+        
+        offsets = np.arange(0, len(pcm), block)
+        mins, maxs = self.levels[0]
+        mins[b0:b0 + len(offsets)] = np.minimum.reduceat(pcm.min(axis=1), offsets)
+        maxs[b0:b0 + len(offsets)] = np.maximum.reduceat(pcm.max(axis=1), offsets)
+        
+        lo, hi = b0, b0 + len(offsets) - 1
+        for level in range(1, len(self.levels)):
+            child_mins, child_maxs = self.levels[level - 1]
+            lo, hi = lo // 2, hi // 2
+            parents = np.arange(lo, hi + 1)
+            left = parents * 2
+            right = np.minimum(left + 1, len(child_mins) - 1)
+            mins, maxs = self.levels[level]
+            mins[lo:hi + 1] = np.minimum(child_mins[left], child_mins[right])
+            maxs[lo:hi + 1] = np.maximum(child_maxs[left], child_maxs[right])
+    
+    def peaks(self, start, end, pixels):
+        """Min and max per pixel for the sample range [start, end), as float arrays in -1..1"""
+        pixels = max(1, int(pixels))
+        samples_per_pixel = max(1.0, (end - start) / pixels)
+        level = int(np.log2(max(1.0, samples_per_pixel / self.block_samples)))
+        level = max(0, min(level, len(self.levels) - 1))
+        bin_samples = self.block_samples << level
+        mins, maxs = self.levels[level]
+        
+        # Bin range of each pixel, at least one bin wide
+        edges = ((start + np.arange(pixels + 1) * samples_per_pixel) // bin_samples).astype(np.int64)
+        first = np.clip(edges[:-1], 0, len(mins) - 1)
+        last = max(int(first[-1]) + 1, min(int(edges[-1]), len(mins)))
+        
+        pixel_mins = np.minimum.reduceat(mins[:last], first)
+        pixel_maxs = np.maximum.reduceat(maxs[:last], first)
+        
+        # Pixels past the end of the audio stay silent
+        outside = edges[:-1] >= len(mins)
+        pixel_mins[outside] = 0
+        pixel_maxs[outside] = 0
+        return pixel_mins / 32768.0, pixel_maxs / 32768.0
+    
+    def cancel(self):
+        self.cancelled = True
+        with self.store.cond:
+            self.store.cond.notify_all()
+
+
+class AudioExtractor:
+    """Decode a file's soundtrack in chunks on a background thread"""
+    def __init__(self, path, on_ready=None, on_progress=None, on_done=None, cache=None, key=None):
+        self.path = path
+        self.on_ready = on_ready
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.cache = cache
+        self.key = key
+        self.store = None
+        self.cancelled = False
+        
+        # Which callbacks have fired, so late attach() calls can replay them
+        self.lock = threading.Lock()
+        self.ready = False
+        self.done = False
+        
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def attach(self, on_ready=None, on_progress=None, on_done=None):
+        """Switch callbacks, replaying ready/done if they already fired (for extraction started ahead of time)"""
+        with self.lock:
+            self.on_ready = on_ready
+            self.on_progress = on_progress
+            self.on_done = on_done
+            ready, done, store = self.ready, self.done, self.store
+        if ready and on_ready is not None:
+            on_ready(store)
+        if done and on_done is not None:
+            on_done(store)
+    
+    def notify_ready(self, store):
+        with self.lock:
+            self.ready = True
+            callback = self.on_ready
+        if callback is not None:
+            callback(store)
+    
+    def notify_done(self, store):
+        with self.lock:
+            self.done = True
+            callback = self.on_done
+        if callback is not None:
+            callback(store)
+    
+    def run(self):
+        video_clip = None
+        try:
+            if self.load_cached():
+                return
+            
+            # moviepy pulls in a large dependency tree, load it only when a soundtrack has to be decoded
+            from moviepy.editor import VideoFileClip
+            
+            video_clip = VideoFileClip(self.path)
+            audio = video_clip.audio
+            if audio is None:
+                if self.cache is not None:
+                    self.cache.save_json(self.key, 'audio.json', {'has_audio': False})
+                self.notify_ready(None)
+                return
+            
+            self.store = AudioStore(int(audio.duration * audio.fps), audio.nchannels, audio.fps)
+            self.notify_ready(self.store)
+            
+            while not self.cancelled:
+                chunk = self.store.next_missing_chunk()
+                if chunk is None:
+                    break
+                
+                start, end = self.store.chunk_range(chunk)
+                tt = np.arange(start, end) / audio.fps
+                self.store.write_chunk(chunk, audio.to_soundarray(tt, fps=audio.fps))
+                
+                if self.on_progress is not None:
+                    self.on_progress(self.store.progress())
+            
+            if not self.cancelled:
+                self.notify_done(self.store)
+            
+            # The PCM goes in first, the metadata marks the cached copy complete
+            if not self.cancelled and self.cache is not None:
+                self.store.flush()
+                self.cache.save_file(self.key, 'audio.pcm', self.store.path)
+                self.cache.save_json(self.key, 'audio.json', {
+                    'has_audio': True,
+                    'total_samples': self.store.total_samples,
+                    'channels': self.store.channels,
+                    'sample_rate': self.store.sample_rate,
+                })
+        except Exception as e:
+            print(f"Audio extraction error: {e}")
+            if self.store is None:
+                self.notify_ready(None)
+        finally:
+            if video_clip is not None:
+                video_clip.close()
+            if self.cancelled and self.store is not None:
+                self.store.close()
+    
+    def load_cached(self):
+        """Serve the soundtrack from the media cache if it was extracted before"""
+        if self.cache is None:
+            return False
+        info = self.cache.load_json(self.key, 'audio.json')
+        if info is None:
+            return False
+        
+        if not info['has_audio']:
+            self.notify_ready(None)
+            return True
+        
+        pcm = self.cache.lookup(self.key, 'audio.pcm')
+        if pcm is None:
+            return False
+        self.store = AudioStore(info['total_samples'], info['channels'], info['sample_rate'], path=pcm)
+        self.notify_ready(self.store)
+        self.notify_done(self.store)
+        return True
+    
+    def cancel(self):
+        """Stop extracting and release the store, later writes become no-ops"""
+        self.cancelled = True
+        if self.store is not None:
+            self.store.close()
+
+
+class AudioRingBuffer:
+    """Single-producer single-consumer float32 ring buffer
+    
+    The producer only advances write_count and the consumer only advances
+    read_count, so neither side needs a lock.
+    """
+    def __init__(self, capacity, channels):
+        self.capacity = capacity
+        self.data = np.zeros((capacity, channels), dtype=np.float32)
+        self.write_count = 0
+        self.read_count = 0
+        
+        # Everything written before this mark is discarded by the consumer
+        self.flush_mark = 0
+    
+    def available(self):
+        return self.write_count - max(self.read_count, self.flush_mark)
+    
+    def space(self):
+        return self.capacity - self.available()
+    
+    def write(self, block):
+        """Copy as much of block as fits, return the number of samples written"""
+        n = min(len(block), self.space())
+        start = self.write_count % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = block[:first]
+        self.data[:n - first] = block[first:n]
+        self.write_count += n
+        return n
+    
+    def read_into(self, out):
+        """Fill out from the buffer, padding with silence, return the number of samples read"""
+        if self.read_count < self.flush_mark:
+            self.read_count = self.flush_mark
+        
+        n = min(len(out), self.write_count - self.read_count)
+        start = self.read_count % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self.data[start:start + first]
+        out[first:n] = self.data[:n - first]
+        out[n:] = 0
+        self.read_count += n
+        return n
+    
+    def flush(self):
+        """Drop unplayed samples, called from the producer side"""
+        self.flush_mark = self.write_count
+
+
+class TimeStretcher:
+    """Streaming WSOLA time-stretch: changes speed without changing pitch
+    
+    Input is cut into Hann-windowed frames taken every hop * speed samples
+    and overlap-added every hop samples. Each frame is shifted within a small
+    search range to line up with the natural continuation of the previous
+    frame, which avoids phase cancellation at the seams. The input tail and
+    pending overlap carry over between calls, so blocks of any size join
+    seamlessly. All channels share the same alignment and are processed
+    together.
+    """
+    def __init__(self, sample_rate, channels, frame_ms=40, search_ms=8):
+        self.channels = channels
+        self.frame = 2 * max(16, int(sample_rate * frame_ms / 2000))
+        self.hop = self.frame // 2
+        self.search = max(1, int(sample_rate * search_ms / 1000))
+        
+        # Periodic Hann windows at 50% overlap sum to exactly one
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(self.frame) / self.frame)).astype(np.float32)[:, None]
+        self.reset()
+    
+    def reset(self):
+        """Forget all state, used after a seek or speed change"""
+        self.buffer_start = 0
+        self.analysis_pos = float(self.search)
+        self.prev_start = None
+        self.overlap = np.zeros((self.hop, self.channels), dtype=np.float32)
+        
+        # Pad the front so the first search window has room to move backwards
+        self.buffer = np.zeros((self.search, self.channels), dtype=np.float32)
+    
+    def process(self, block, speed):
+        """Stretch a block of samples, returns roughly len(block) / speed samples"""
+        block = np.asarray(block, dtype=np.float32).reshape(len(block), self.channels)
+        self.buffer = np.concatenate((self.buffer, block))
+        analysis_hop = self.hop * speed
+        frame, hop, search = self.frame, self.hop, self.search
+        out = []
+        
+        while True:
+            nominal = int(round(self.analysis_pos)) - self.buffer_start
+            lo = max(0, nominal - search)
+            hi = nominal + search
+            prev = None if self.prev_start is None else self.prev_start - self.buffer_start
+            if hi + frame > len(self.buffer) or prev is not None and prev + hop + frame > len(self.buffer):
+                break
+            
+            start = nominal
+            if prev is not None:
+                # Best match for the natural continuation of the previous frame, on the channel mix
+                template = self.buffer[prev + hop:prev + hop + frame].sum(axis=1)
+                region = self.buffer[lo:hi + frame].sum(axis=1)
+                start = lo + int(np.argmax(np.correlate(region, template, mode='valid')))
+            
+            grain = self.buffer[start:start + frame] * self.window
+            out.append(self.overlap + grain[:hop])
+            self.overlap = grain[hop:]
+            self.prev_start = start + self.buffer_start
+            self.analysis_pos += analysis_hop
+        
+        # Drop input no future frame or template can reach
+        keep_from = min(self.prev_start - self.buffer_start + hop if self.prev_start is not None else 0, 
+                        int(self.analysis_pos) - self.buffer_start - search)
+        if keep_from > 0:
+            self.buffer = self.buffer[keep_from:]
+            self.buffer_start += keep_from
+        
+        if not out:
+            return np.zeros((0, self.channels), dtype=np.float32)
+        return np.concatenate(out)
+
+
+class AudioEngine:
+    """Persistent output stream fed from an AudioStore, its played sample count is the playback clock"""
+    def __init__(self, store, blocksize=1024, buffer_seconds=0.5, feed_seconds=0.1):
+        self.store = store
+        self.sample_rate = store.sample_rate
+        self.channels = store.channels
+        self.stretcher = TimeStretcher(self.sample_rate, self.channels)
+        self.feed_samples = int(feed_seconds * self.sample_rate)
+        self.ring = AudioRingBuffer(int(buffer_seconds * self.sample_rate) + self.feed_samples * 4, self.channels)
+        
+        # Source position the feeder reads next, and seek/speed changes waiting for the feeder
+        self.lock = threading.Lock()
+        self.position = 0
+        self.speed = 1.0
+        self.pending_seek = None
+        self.pending_speed = None
+        self.running = False
+        self.stopped = False
+        
+        # (output sample, source sample, speed) the current stretch of output started at
+        self.segment = (0, 0, 1.0)
+        self.end_of_audio = None
+        self.drained_time = None
+        self.paused_position = None
+        
+        # A-B loop as (start, end, pcm, speed): the feeder does not read past end, and with pcm
+        # (the region stretched for speed) it repeats that block from memory. active_loop is
+        # (start, end, pcm) while the output is being fed from the block, loop_offset the next sample in it
+        self.loop = None
+        self.active_loop = None
+        self.loop_offset = 0
+        
+        # Timing of the last callback for interpolating the clock between callbacks
+        self.callback_time = None
+        self.callback_read_count = 0
+        self.callback_period = blocksize / self.sample_rate
+        self.output_latency = 0.0
+        
+        # Counters
+        self.underruns = 0
+        
+        # Optional StageMetrics receiving callback durations and underruns
+        self.metrics = None
+        
+        # The audio library is loaded with the first engine, when playback first needs sound
+        import sounddevice as sd
+        
+        self.stream = sd.OutputStream(
+            samplerate=self.sample_rate,
+            channels=self.channels,
+            dtype='float32',
+            blocksize=blocksize,
+            callback=self.callback
+        )
+        self.stream.start()
+        self.output_latency = self.stream.latency
+        
+        self.thread = threading.Thread(target=self.feed)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def callback(self, outdata, frames, time_info, status):
+        """Audio device callback: copy the next block out of the ring buffer"""
+        started = time.perf_counter()
+        if status.output_underflow:
+            self.count_underrun()
+        
+        if not self.running:
+            outdata.fill(0)
+            self.callback_time = None
+            return
+        
+        # The latency below is that of the block's first sample, so the clock counts from there
+        read_count = self.ring.read_count
+        n = self.ring.read_into(outdata)
+        now = time.perf_counter()
+        if n < frames:
+            if self.end_of_audio is None:
+                self.count_underrun()
+            elif self.ring.read_count >= self.end_of_audio and self.drained_time is None:
+                self.drained_time = now
+        
+        latency = time_info.outputBufferDacTime - time_info.currentTime
+        if latency > 0:
+            self.output_latency = latency
+        self.callback_period = frames / self.sample_rate
+        self.callback_read_count = read_count
+        self.callback_time = now
+        
+        if self.metrics is not None:
+            self.metrics.record('audio_callback_ms', (time.perf_counter() - started) * 1000)
+    
+    def count_underrun(self):
+        self.underruns += 1
+        if self.metrics is not None:
+            self.metrics.count('audio_underruns')
+    
+    def feed(self):
+        """Feeder loop: read from the store, apply the speed change and fill the ring buffer"""
+        while not self.stopped:
+            try:
+                self.apply_pending()
+                
+                if not self.running and self.ring.available() >= self.feed_samples * 2 or self.ring.space() < self.feed_samples * 2:
+                    time.sleep(self.feed_samples / self.sample_rate / 4)
+                    continue
+                
+                if self.active_loop is not None:
+                    self.feed_loop()
+                    continue
+                
+                # A streamed loop parks at its end until the playback worker seeks back to the start
+                end = len(self.store)
+                loop = self.loop
+                if loop is not None and loop[0] <= self.position <= loop[1]:
+                    end = min(end, loop[1])
+                
+                if self.position >= end:
+                    if self.end_of_audio is None:
+                        self.end_of_audio = self.ring.write_count
+                    time.sleep(0.02)
+                    continue
+                
+                # Source samples needed for one feed block at this speed
+                count = min(int(self.feed_samples * self.speed), end - self.position)
+                if not self.store.wait_for(self.position, count, timeout=0.05):
+                    continue
+                
+                block = self.store.read(self.position, self.position + count)
+                if self.speed != 1.0:
+                    block = self.stretcher.process(block, self.speed)
+                self.ring.write(block.reshape(len(block), -1))
+                self.position += count
+            except Exception as e:
+                print(f"Audio feed error: {e}")
+                time.sleep(0.1)
+    
+    def feed_loop(self):
+        """Copy the next feed block out of the cached loop, wrapping around at its end"""
+        start, end, pcm = self.active_loop
+        count = min(self.feed_samples, len(pcm) - self.loop_offset)
+        self.ring.write(pcm[self.loop_offset:self.loop_offset + count])
+        self.loop_offset = (self.loop_offset + count) % len(pcm)
+    
+    def set_loop(self, start=None, end=None, pcm=None, speed=None):
+        """Repeat source samples start..end, from pcm when given (no start clears the loop)"""
+        with self.lock:
+            self.loop = None if start is None else (start, end, pcm, speed)
+            
+            # Leave the cached block if it was replaced or removed
+            if self.active_loop is not None and self.pending_seek is None:
+                self.pending_seek = self.source_position()
+    
+    def apply_pending(self):
+        """Rebase the output on a new source position and/or speed, dropping queued samples"""
+        with self.lock:
+            if self.pending_seek is None and self.pending_speed is None:
+                return
+            position = self.pending_seek
+            speed = self.pending_speed if self.pending_speed is not None else self.speed
+            self.pending_seek = None
+            self.pending_speed = None
+        
+        if position is None:
+            position = self.source_position()
+        
+        self.ring.flush()
+        self.stretcher.reset()
+        self.position = max(0, min(int(position), len(self.store)))
+        self.speed = speed
+        self.end_of_audio = None
+        self.drained_time = None
+        
+        # Inside a cached loop at its speed, output comes from the block, start it where position falls
+        loop = self.loop
+        self.active_loop = None
+        if loop is not None and loop[2] is not None and len(loop[2]) and loop[3] == speed and loop[0] <= self.position < loop[1]:
+            start, end, pcm = loop[:3]
+            ratio = (end - start) / len(pcm)
+            self.loop_offset = min(int((self.position - start) / ratio), len(pcm) - 1)
+            self.active_loop = (start, end, pcm)
+            self.segment = (self.ring.write_count - self.loop_offset, start, ratio)
+        else:
+            self.segment = (self.ring.write_count, self.position, speed)
+    
+    def source_position(self):
+        """Source sample currently audible at the output"""
+        if not self.running and self.paused_position is not None:
+            return self.paused_position
+        
+        out_start, src_start, speed = self.segment
+        if self.drained_time is not None:
+            # Past the end of the audio, keep time running from the wall clock
+            played = self.end_of_audio + (time.perf_counter() - self.drained_time) * self.sample_rate
+        elif self.callback_time is not None:
+            # Samples handed to the device are heard after the output latency
+            elapsed = min(time.perf_counter() - self.callback_time, self.callback_period)
+            played = self.callback_read_count + (elapsed - self.output_latency) * self.sample_rate
+        else:
+            played = out_start
+        
+        offset = max(0, played - out_start) * speed
+        if self.active_loop is not None:
+            start, end, pcm = self.active_loop
+            return src_start + offset % (end - start)
+        return src_start + offset
+    
+    def clock(self):
+        """Media time in seconds of the sample currently being heard"""
+        return self.source_position() / self.sample_rate
+    
+    def play(self, seconds, speed):
+        """Rebase on the given position and start consuming once the feeder has prefilled"""
+        position = int(seconds * self.sample_rate)
+        self.store.request(position)
+        with self.lock:
+            self.pending_seek = position
+            self.pending_speed = speed
+        
+        deadline = time.perf_counter() + 0.2
+        while (self.pending_seek is not None or self.ring.available() < self.feed_samples) and time.perf_counter() < deadline:
+            time.sleep(0.002)
+        self.paused_position = None
+        self.running = True
+    
+    def pause(self):
+        """Stop consuming samples, the clock holds its position"""
+        if self.running:
+            self.paused_position = self.source_position()
+        self.running = False
+    
+    def set_speed(self, speed):
+        with self.lock:
+            self.pending_speed = speed
+    
+    def close(self):
+        self.running = False
+        self.stopped = True
+        try:
+            self.stream.stop()
+            self.stream.close()
+        except Exception as e:
+            print(f"Error closing audio stream: {e}")
+
+
+class FrameRenderer:
+    """Draw frames on a canvas reusing one image item, one PhotoImage and preallocated buffers"""
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.item = None
+        self.photo = None
+        
+        # Optional StageMetrics receiving resize/convert and Tk paste times
+        self.metrics = None
+        
+        # Layout is recomputed only when the canvas or frame size changes
+        self.canvas_size = None
+        self.frame_size = None
+        self.target_size = None
+        self.resized = None
+        self.rgba = None
+        self.image = None
+    
+    def layout(self, canvas_size, frame_size):
+        """Compute the fitted size and allocate buffers for it"""
+        canvas_width, canvas_height = canvas_size
+        w, h = frame_size
+        if canvas_width > 1 and canvas_height > 1:
+            scale = min(canvas_width/w, canvas_height/h)
+            new_w, new_h = max(1, int(w*scale)), max(1, int(h*scale))
+        else:
+            new_w, new_h = w, h
+        
+        self.canvas_size = canvas_size
+        self.frame_size = frame_size
+        self.target_size = (new_w, new_h)
+        self.resized = np.empty((new_h, new_w, 3), dtype=np.uint8)
+        self.rgba = np.empty((new_h, new_w, 4), dtype=np.uint8)
+        
+        # PIL can only share memory with 4-byte pixels, so convert straight to RGBA
+        self.image = Image.frombuffer('RGBA', (new_w, new_h), self.rgba, 'raw', 'RGBA', 0, 1)
+        
+        if self.item is not None:
+            self.canvas.coords(self.item, canvas_width//2, canvas_height//2)
+    
+    def prepare(self, frame, canvas_size, bgr=True):
+        """Resize first, then convert color on the small image, into the shared RGBA buffer"""
+        frame_size = (frame.shape[1], frame.shape[0])
+        if canvas_size != self.canvas_size or frame_size != self.frame_size:
+            self.layout(canvas_size, frame_size)
+        
+        if self.target_size == frame_size:
+            small = frame
+        else:
+            small = cv2.resize(frame, self.target_size, dst=self.resized, interpolation=cv2.INTER_LINEAR)
+        
+        cv2.cvtColor(small, cv2.COLOR_BGR2RGBA if bgr else cv2.COLOR_RGB2RGBA, dst=self.rgba)
+        return self.image
+    
+    def draw(self, frame, bgr=True):
+        """Prepare the frame for the current canvas size, then update the canvas in place"""
+        started = time.perf_counter()
+        self.prepare(frame, (self.canvas.winfo_width(), self.canvas.winfo_height()), bgr)
+        prepared = time.perf_counter()
+        self.paste(self.image)
+        
+        if self.metrics is not None:
+            self.metrics.record('resize_convert_ms', (prepared - started) * 1000)
+            self.metrics.record('paste_ms', (time.perf_counter() - prepared) * 1000)
+    
+    def draw_prepared(self, rgba):
+        """Show an RGBA frame already scaled for the current layout, there is nothing to resize or convert"""
+        started = time.perf_counter()
+        self.paste(Image.frombuffer('RGBA', (rgba.shape[1], rgba.shape[0]), rgba, 'raw', 'RGBA', 0, 1))
+        
+        if self.metrics is not None:
+            self.metrics.record('paste_ms', (time.perf_counter() - started) * 1000)
+    
+    def paste(self, image):
+        """Update the canvas in place, reusing the PhotoImage when the size matches"""
+        if self.photo is not None and (self.photo.width(), self.photo.height()) == image.size:
+            self.photo.paste(image)
+        else:
+            self.photo = ImageTk.PhotoImage(image=image)
+            if self.item is None:
+                self.item = self.canvas.create_image(
+                    self.canvas_size[0]//2, 
+                    self.canvas_size[1]//2, 
+                    image=self.photo, 
+                    anchor=tk.CENTER
+                )
+            else:
+                self.canvas.itemconfig(self.item, image=self.photo)
+
+
+class PresentationScheduler:
+    """Compute absolute frame deadlines from a monotonic clock, a start anchor and the speed
+    
+    Every deadline is derived from the anchor rather than from the previous
+    frame, so sleep error never accumulates. Seeks and speed changes rebase
+    the anchor and wake any pending wait immediately.
+    """
+    def __init__(self, spin_seconds=0.002):
+        self.spin_seconds = spin_seconds
+        self.cond = threading.Condition()
+        self.anchor_wall = time.perf_counter()
+        self.anchor_media = 0.0
+        self.speed = 1.0
+        self.generation = 0
+        
+        # Wake-up lateness and presented-frame offset, in seconds
+        self.jitter = deque(maxlen=1000)
+        self.drift = deque(maxlen=1000)
+    
+    def interrupt(self):
+        """Wake any waiter without moving the anchor"""
+        with self.cond:
+            self.generation += 1
+            self.cond.notify_all()
+    
+    def rebase(self, media_time, speed=None):
+        """Restart the timeline at media_time now, waking any waiter"""
+        with self.cond:
+            self.anchor_wall = time.perf_counter()
+            self.anchor_media = media_time
+            if speed is not None:
+                self.speed = speed
+            self.generation += 1
+            self.cond.notify_all()
+    
+    def sync(self, media_time):
+        """Follow an external master clock without waking waiters"""
+        with self.cond:
+            self.anchor_wall = time.perf_counter()
+            self.anchor_media = media_time
+    
+    def media_time(self, now=None):
+        if now is None:
+            now = time.perf_counter()
+        return self.anchor_media + (now - self.anchor_wall) * self.speed
+    
+    def deadline(self, media_time):
+        """Wall-clock time at which media_time is due"""
+        return self.anchor_wall + (media_time - self.anchor_media) / self.speed
+    
+    def wait_until(self, deadline):
+        """Sleep until the deadline, return False if a rebase happened meanwhile"""
+        with self.cond:
+            generation = self.generation
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= self.spin_seconds:
+                    break
+                self.cond.wait(remaining - self.spin_seconds)
+                if self.generation != generation:
+                    return False
+        
+        # Short spin for the last stretch, sleep granularity is too coarse for it
+        while time.perf_counter() < deadline:
+            time.sleep(0)
+        
+        self.jitter.append(time.perf_counter() - deadline)
+        return self.generation == generation
+    
+    def record_presentation(self, frame_time):
+        """Offset between the clock and the timestamp of the frame just presented"""
+        self.drift.append(self.media_time() - frame_time)
+    
+    def stats(self):
+        """Jitter and drift summary in milliseconds"""
+        jitter = np.array(self.jitter) * 1000 if self.jitter else np.zeros(1)
+        drift = np.array(self.drift) * 1000 if self.drift else np.zeros(1)
+        return {
+            'jitter_mean_ms': float(jitter.mean()),
+            'jitter_max_ms': float(jitter.max()),
+            'drift_ms': float(drift[-1]),
+            'drift_max_ms': float(np.abs(drift).max()),
+        }
+
+
+class PlaybackEngine:
+    """Long-lived presentation worker driven by a command queue
+    
+    Seek, speed, pause, resume and step requests are queued and applied by
+    one worker thread between frames, so none of them tear down or restart
+    threads. The decoder and audio engine stay alive for the whole file and
+    are only repositioned.
+    
+    frame_time/frame_at_time map between frames and seconds, frame_count and
+    get_position read the timeline and current frame, and on_present(frame,
+    deadline, backward, wrapped) is called from the worker to show a frame
+    (deadline is None for seeks and steps, wrapped is set when a loop jumps
+    back to its start).
+    """
+    def __init__(self, frame_time, frame_at_time, frame_count, get_position, on_present, on_end=None):
+        self.frame_time = frame_time
+        self.frame_at_time = frame_at_time
+        self.frame_count = frame_count
+        self.get_position = get_position
+        self.on_present = on_present
+        self.on_end = on_end
+        
+        self.commands = queue.Queue()
+        self.scheduler = PresentationScheduler()
+        self.audio = None
+        self.speed = 1.0
+        self.playing = False
+        
+        # (first, last) frames repeated while the playhead is inside them
+        self.loop = None
+        
+        # Time each command was sent and applied, for latency measurements
+        self.last_command_latency = 0.0
+        
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def send(self, command, arg=None):
+        """Queue a command and wake the worker if it is waiting for a frame deadline"""
+        self.commands.put((command, arg, time.perf_counter()))
+        self.scheduler.interrupt()
+    
+    def seek(self, frame):
+        self.send('seek', frame)
+    
+    def set_speed(self, speed):
+        self.send('set_speed', speed)
+    
+    def pause(self):
+        self.send('pause')
+    
+    def resume(self):
+        self.send('resume')
+    
+    def step(self, delta):
+        self.send('step', delta)
+    
+    def attach_audio(self, audio):
+        self.send('audio', audio)
+    
+    def set_loop(self, loop):
+        self.send('loop', loop)
+    
+    def barrier(self):
+        """Event set once every command sent before it has been applied, it never blocks the caller"""
+        applied = threading.Event()
+        self.send('barrier', applied)
+        return applied
+    
+    def wait_idle(self):
+        """Block until every queued command has been applied
+        
+        Never call this from the Tk thread: the worker may be waiting on a
+        display update there, use VideoPlayer.after_playback_idle instead.
+        """
+        self.commands.join()
+    
+    def close(self):
+        self.send('quit')
+    
+    def run(self):
+        """Worker loop: apply queued commands, otherwise present the next frame"""
+        while True:
+            try:
+                command, arg, sent = self.commands.get(block=not self.playing)
+            except queue.Empty:
+                self.present_next()
+                continue
+            
+            try:
+                if command == 'quit':
+                    break
+                self.apply(command, arg)
+                self.last_command_latency = time.perf_counter() - sent
+            except Exception as e:
+                print(f"Playback command error: {e}")
+            finally:
+                self.commands.task_done()
+    
+    def apply(self, command, arg):
+        position = self.get_position()
+        
+        if command == 'resume':
+            # At the last frame only a loop around it plays on, otherwise the end is reported
+            # right away so the UI leaves the playing state it switched to
+            in_loop = self.loop is not None and self.loop[0] <= position <= self.loop[1]
+            if position >= self.frame_count() - 1 and not in_loop:
+                if self.on_end is not None:
+                    self.on_end()
+                return
+            self.playing = True
+            self.scheduler.rebase(self.frame_time(position), self.speed)
+            self.start_audio(position)
+        
+        elif command == 'pause':
+            self.playing = False
+            if self.audio is not None:
+                self.audio.pause()
+        
+        elif command == 'barrier':
+            arg.set()
+        
+        elif command == 'seek':
+            frame = max(0, min(arg, self.frame_count() - 1))
+            self.on_present(frame, None, False)
+            if self.playing:
+                self.scheduler.rebase(self.frame_time(frame), self.speed)
+                self.start_audio(frame)
+        
+        elif command == 'set_speed':
+            self.speed = arg
+            if self.playing:
+                self.scheduler.rebase(self.frame_time(position), arg)
+                if self.audio is not None:
+                    self.audio.set_speed(arg)
+        
+        elif command == 'step':
+            self.apply('pause', None)
+            frame = max(0, min(position + arg, self.frame_count() - 1))
+            if frame != position:
+                self.on_present(frame, None, arg < 0)
+        
+        elif command == 'audio':
+            if self.audio is not None:
+                self.audio.pause()
+            self.audio = arg
+            if self.playing:
+                self.start_audio(position)
+        
+        elif command == 'loop':
+            self.loop = arg
+    
+    def end_time(self, frame):
+        """Time at which a frame stops being displayed"""
+        if frame + 1 < self.frame_count():
+            return self.frame_time(frame + 1)
+        return 2 * self.frame_time(frame) - self.frame_time(frame - 1)
+    
+    def start_audio(self, frame):
+        """Audio starts at the frame's timestamp and drives the video clock from there"""
+        if self.audio is None:
+            return
+        try:
+            self.audio.play(self.frame_time(frame), self.speed)
+        except Exception as e:
+            print(f"Error starting audio: {e}")
+    
+    def present_next(self):
+        """Wait for the next frame's deadline and present whatever frame is due then"""
+        scheduler = self.scheduler
+        position = self.get_position()
+        last = self.frame_count() - 1
+        loop = self.loop if self.loop is not None and self.loop[0] <= position <= self.loop[1] else None
+        if position >= last and loop is None:
+            self.apply('pause', None)
+            if self.on_end is not None:
+                self.on_end()
+            return
+        
+        # With audio, the played sample count is the master clock
+        if self.audio is not None and self.audio.running:
+            clock = self.audio.clock()
+            if loop is not None:
+                # Audio repeating the loop from memory can wrap around just before the video
+                loop_length = self.end_time(loop[1]) - self.frame_time(loop[0])
+                if clock < self.frame_time(position) - loop_length / 2:
+                    clock += loop_length
+            scheduler.sync(clock)
+        
+        if loop is not None and position >= loop[1]:
+            self.wrap_loop(loop)
+            return
+        
+        # Go back to the queue if a command arrives before the deadline
+        deadline = scheduler.deadline(self.frame_time(position + 1))
+        if not scheduler.wait_until(deadline):
+            return
+        
+        # Present the frame due now, frames the video is late for are dropped
+        now = scheduler.media_time()
+        end = loop[1] if loop is not None else last
+        target = max(position + 1, min(self.frame_at_time(now), end))
+        self.on_present(target, scheduler.deadline(self.frame_time(target + 1)), False)
+    
+    def wrap_loop(self, loop):
+        """Once the loop's last frame is over, continue at its first frame with the clock moved back by the loop length"""
+        scheduler = self.scheduler
+        start, end = self.frame_time(loop[0]), self.end_time(loop[1])
+        if not scheduler.wait_until(scheduler.deadline(end)):
+            return
+        
+        scheduler.sync(scheduler.media_time() - (end - start))
+        
+        # Audio repeating a cached loop wraps by itself, streamed audio has to seek back
+        if self.audio is not None and self.audio.running and self.audio.active_loop is None:
+            self.start_audio(loop[0])
+        self.on_present(loop[0], scheduler.deadline(self.frame_time(loop[0] + 1)), False, True)
+
+
+class VideoLoader:
+    """Open a file off the UI thread in stages: probe metadata, start the decoder, decode the first frame
+    
+    on_progress(loader, stage) reports each stage as it starts, on_ready(loader)
+    fires once the first frame is decoded and on_failed(loader, message) if
+    the file can't be opened. The UI attaches the frame index, thumbnails and
+    audio itself once the video is shown. A cancelled loader cleans up after
+    itself and reports nothing.
+    """
+    def __init__(self, path, decoder_class, cache_bytes, media_cache=None, on_progress=None, on_ready=None, on_failed=None, first_frame_timeout=10.0, max_buffer_bytes=None):
+        self.path = path
+        self.decoder_class = decoder_class
+        self.cache_bytes = cache_bytes
+        self.max_buffer_bytes = max_buffer_bytes
+        self.media_cache = media_cache
+        self.on_progress = on_progress
+        self.on_ready = on_ready
+        self.on_failed = on_failed
+        self.first_frame_timeout = first_frame_timeout
+        
+        # Results, valid once on_ready has fired
+        self.video = None
+        self.decoder = None
+        self.first_frame = None
+        self.total_frames = 0
+        self.fps = 30
+        self.frame_size = (0, 0)
+        self.media_key = None
+        
+        # Set by the player for loads started ahead of time (playlist preloading)
+        self.audio_extractor = None
+        self.autoplay = False
+        
+        self.started = time.perf_counter()
+        self.first_frame_time = None
+        self.cancelled = False
+        
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def report(self, stage):
+        if self.on_progress is not None and not self.cancelled:
+            self.on_progress(self, stage)
+    
+    def run(self):
+        try:
+            self.report("probing")
+            self.video = cv2.VideoCapture(self.path)
+            if not self.video.isOpened():
+                self.fail("Could not open video")
+                return
+            self.total_frames = int(self.video.get(cv2.CAP_PROP_FRAME_COUNT))
+            self.fps = self.video.get(cv2.CAP_PROP_FPS)
+            self.frame_size = (int(self.video.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.video.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            if self.media_cache is not None:
+                self.media_key = self.media_cache.key(self.path)
+            if self.cancelled:
+                self.discard()
+                return
+            
+            self.report("decoding first frame")
+            capacity = self.decoder_class.DEFAULT_CAPACITY
+            if self.max_buffer_bytes is not None:
+                # Keep the read-ahead of a preloaded item within its memory budget
+                frame_bytes = max(1, self.frame_size[0] * self.frame_size[1] * 3)
+                capacity = max(2, min(capacity, self.max_buffer_bytes // frame_bytes))
+            self.decoder = self.decoder_class(self.path, capacity=capacity, cache_bytes=self.cache_bytes)
+            
+            # Short waits so a cancel doesn't have to sit out the whole timeout
+            deadline = time.perf_counter() + self.first_frame_timeout
+            while self.first_frame is None and not self.cancelled and time.perf_counter() < deadline:
+                self.first_frame = self.decoder.get_frame(0, timeout=0.1)
+                if self.decoder.end_of_stream and self.first_frame is None:
+                    break
+            if self.cancelled:
+                self.discard()
+                return
+            if self.first_frame is None:
+                self.fail("Could not decode video")
+                return
+            
+            self.first_frame_time = time.perf_counter() - self.started
+            if self.on_ready is not None:
+                self.on_ready(self)
+        except Exception as e:
+            print(f"Video load error: {e}")
+            self.fail(f"Could not open video: {e}")
+    
+    def fail(self, message):
+        cancelled = self.cancelled
+        self.discard()
+        if self.on_failed is not None and not cancelled:
+            self.on_failed(self, message)
+    
+    def discard(self):
+        """Release everything opened so far, for a load that will never be shown"""
+        if self.audio_extractor is not None:
+            self.audio_extractor.cancel()
+            self.audio_extractor = None
+        if self.decoder is not None:
+            self.decoder.close()
+            self.decoder = None
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+    
+    def cancel(self):
+        self.cancelled = True
+
+
+class StageMetrics:
+    """Rolling per-stage measurements and counters, with a session trace for offline analysis
+    
+    record(stage, value) keeps the last window values of each stage for the
+    overlay and appends (seconds since start, stage, value) to the trace,
+    which keeps the last trace_limit entries, several minutes of playback.
+    Appends to deques are atomic, so stages on any thread record without a lock.
+    """
+    # Overlay rows: stage, label, unit
+    STAGES = [
+        ('decode_ms', 'decode', 'ms'),
+        ('frame_wait_ms', 'frame wait', 'ms'),
+        ('resize_convert_ms', 'resize+cvt', 'ms'),
+        ('paste_ms', 'Tk paste', 'ms'),
+        ('tk_latency_ms', 'Tk latency', 'ms'),
+        ('audio_callback_ms', 'audio cb', 'ms'),
+        ('queue_depth', 'queue', 'fr'),
+        ('av_offset_ms', 'A/V', 'ms'),
+        ('first_frame_ms', 'first frame', 'ms'),
+    ]
+    
+    def __init__(self, window=300, trace_limit=100000):
+        self.window = window
+        self.samples = {}
+        self.counters = {}
+        self.trace = deque(maxlen=trace_limit)
+        self.start = time.perf_counter()
+    
+    def record(self, stage, value):
+        samples = self.samples.get(stage)
+        if samples is None:
+            samples = self.samples.setdefault(stage, deque(maxlen=self.window))
+        samples.append(value)
+        self.trace.append((time.perf_counter() - self.start, stage, value))
+    
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+    
+    def summary(self, stage):
+        """Count, mean, median, 95th percentile and max over the rolling window"""
+        values = np.array(self.samples.get(stage, ()), dtype=np.float64)
+        if len(values) == 0:
+            return None
+        p50, p95 = np.percentile(values, [50, 95])
+        return {
+            'count': len(values),
+            'mean': float(values.mean()),
+            'p50': float(p50),
+            'p95': float(p95),
+            'max': float(values.max()),
+        }
+    
+    def histogram(self, stage, bins=8):
+        """Histogram of the rolling window from 0 to the window max, as (counts, edges)"""
+        values = np.array(self.samples.get(stage, ()), dtype=np.float64)
+        if len(values) == 0:
+            return None
+        high = max(values.max(), 1e-6)
+        counts, edges = np.histogram(values, bins=bins, range=(min(0.0, values.min()), high))
+        return counts, edges
+    
+    def sparkline(self, stage, bins=8):
+        """Histogram drawn with block characters for the overlay"""
+        histogram = self.histogram(stage, bins)
+        if histogram is None:
+            return ""
+        counts = histogram[0]
+        blocks = " ▁▂▃▄▅▆▇█"
+        return "".join(blocks[int(round(c / counts.max() * 8))] for c in counts)
+    
+    def overlay_text(self):
+        lines = []
+        for stage, label, unit in self.STAGES:
+            summary = self.summary(stage)
+            if summary is None:
+                continue
+            lines.append(
+                f"{label:<11}{summary['mean']:7.1f} {unit}  p95 {summary['p95']:6.1f}  max {summary['max']:6.1f}  {self.sparkline(stage)}"
+            )
+        if self.counters:
+            lines.append("  ".join(f"{name}: {n}" for name, n in sorted(self.counters.items())))
+        return "\n".join(lines) if lines else "No measurements yet"
+    
+    def snapshot(self):
+        """Summaries and histograms of every stage plus the counters"""
+        stages = {}
+        for stage in list(self.samples):
+            histogram = self.histogram(stage)
+            stages[stage] = dict(self.summary(stage), histogram={
+                'counts': histogram[0].tolist(), 
+                'edges': histogram[1].tolist()
+            })
+        return {
+            'duration_s': time.perf_counter() - self.start,
+            'stages': stages,
+            'counters': dict(self.counters),
+        }
+    
+    def export_json(self, path):
+        report = self.snapshot()
+        report['trace'] = [list(entry) for entry in list(self.trace)]
+        with open(path, 'w') as f:
+            json.dump(report, f)
+    
+    def export_csv(self, path):
+        """One row per measurement, counters follow as rows at the session end time"""
+        duration = time.perf_counter() - self.start
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['time_s', 'stage', 'value'])
+            writer.writerows(list(self.trace))
+            for name, n in sorted(self.counters.items()):
+                writer.writerow([duration, name, n])
+
+
+class StartupProfile:
+    """Startup timeline: each mark is an event with its time since the module started loading
+    
+    The report lists every event with the time since the previous one, so
+    slow phases stand out. BUDGET_MS holds the totals the window and the first
+    frame are expected to beat, used by --profile-startup and the benchmark.
+    """
+    BUDGET_MS = {'imported': 500, 'window shown': 1000, 'first frame shown': 1500}
+    
+    def __init__(self, started=MODULE_STARTED):
+        self.started = started
+        self.marks = []
+    
+    def mark(self, event):
+        self.marks.append((event, (time.perf_counter() - self.started) * 1000))
+    
+    def over_budget(self):
+        """Events that came later than their budget, as {event: (ms, budget ms)}"""
+        return {event: (ms, self.BUDGET_MS[event]) for event, ms in self.marks 
+                if event in self.BUDGET_MS and ms > self.BUDGET_MS[event]}
+    
+    def report(self):
+        lines = [f"{'event':<28}{'phase ms':>10}{'total ms':>10}"]
+        previous = 0.0
+        for event, ms in self.marks:
+            line = f"{event:<28}{ms - previous:10.1f}{ms:10.1f}"
+            if event in self.BUDGET_MS:
+                budget = self.BUDGET_MS[event]
+                line += f"  budget {budget} ms" + ("  OVER" if ms > budget else "")
+            lines.append(line)
+            previous = ms
+        return "\n".join(lines)
+    
+    def export_json(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'marks': [{'event': event, 'ms': ms} for event, ms in self.marks],
+                'budget_ms': self.BUDGET_MS,
+                'over_budget': sorted(self.over_budget()),
+            }, f, indent=2)
+
 
 class VideoPlayer:
-    def __init__(self, root):
+    def __init__(self, root, startup=None):
         self.root = root
         self.root.title("Advanced Video Player")
         self.root.geometry("900x750")
@@ -26,19 +2931,98 @@ class VideoPlayer:
         self.total_frames = 0
         self.fps = 30
         self.playback_speed = 1.0
-        self.video_thread = None
-        self.audio_thread = None
-        self.stop_thread = False
         self.video_path = None
-        self.photo = None
-        self.temp_audio_file = None
+        self.audio_extractor = None
+        self.decoder = None
+        self.frame_index = None
+        
+        # Decoded frame cache budget for backward stepping
+        self.frame_cache_bytes = 512 * 1024 * 1024
+        
+        # Decode in a separate process with shared-memory handoff, for high-bitrate 4K content
+        self.decode_in_process = False
+        
+        # Optional proxy mode: sources wider than proxy_min_width get a proxy_width copy for playback and scrubbing
+        self.proxy_mode = False
+        self.proxy_width = 640
+        self.proxy_min_width = 1280
+        self.proxy = None
+        self.proxy_decoder = None
+        
+        # Scrub preview thumbnails: seconds between samples, memory cap and width
+        self.thumbnails = None
+        self.thumbnail_interval = 1.0
+        self.thumbnail_max_bytes = 64 * 1024 * 1024
+        self.thumbnail_width = 160
+        
+        # Extracted audio, frame indexes and thumbnails are kept on disk across sessions
+        try:
+            self.media_cache = MediaCache()
+        except Exception as e:
+            print(f"Media cache error: {e}")
+            self.media_cache = None
+        self.media_key = None
+        
+        # Load in progress, replaced (and cancelled) when another file is opened
+        self.loader = None
+        
+        # Playlist, and the next item opened ahead of time within a read-ahead memory budget
+        self.playlist = []
+        self.playlist_pos = -1
+        self.preloader = None
+        self.preload_max_bytes = 128 * 1024 * 1024
+        
+        # Shot boundary index for next/previous shot navigation
+        self.shots = None
+        
+        # In/out marks for range operations and the running batch export
+        self.mark_in = None
+        self.mark_out = None
+        self.exporter = None
+        
+        # A-B loop over a frame range and its RAM copy when it fits in loop_max_bytes
+        self.loop_range = None
+        self.loop_cache = None
+        self.loop_max_bytes = 256 * 1024 * 1024
         
         # Audio variables
         self.has_audio = False
-        self.audio_data = None
-        self.audio_sample_rate = 44100
-        self.audio_stream = None
-        self.audio_position = 0
+        self.audio_store = None
+        self.audio_engine = None
+        
+        # Waveform strip: peak pyramid of the soundtrack and the visible range in seconds (None for all)
+        self.peaks = None
+        self.waveform_view = None
+        self.waveform_item = None
+        self.waveform_cursor = None
+        self.waveform_drawn = 0.0
+        
+        # A/V sync metric: video minus audio clock at presentation
+        self.av_drift = 0.0
+        
+        # Late-frame policy: at most one display update queued, per-speed presentation counters
+        self.display_pending = False
+        self.display_deadline = None
+        self.display_backward = False
+        self.frame_stats = {}
+        
+        # Per-stage timings and counters, shown in the stats overlay
+        self.metrics = StageMetrics()
+        self.overlay_visible = False
+        self.overlay_item = None
+        self.overlay_updated = 0.0
+        self.display_requested = 0.0
+        
+        # Persistent presentation worker, playback changes are sent to it as commands
+        self.playback = PlaybackEngine(
+            self.frame_time, 
+            self.frame_at_time, 
+            lambda: self.total_frames, 
+            lambda: self.current_frame, 
+            self.present_frame, 
+            on_end=lambda: self.root.after(0, self.on_playback_end)
+        )
+        self.scheduler = self.playback.scheduler
         
         # Seeking flag
         self.seeking = False
@@ -50,10 +3034,17 @@ class VideoPlayer:
         self.root.bind('<Configure>', self.on_window_resize)
         self.last_resize_time = 0
         
+        # Optional StartupProfile, marked until the first frame is on screen
+        self.startup = startup
+        if startup is not None:
+            startup.mark('widgets built')
+        
     def create_widgets(self):
         # Video display canvas
         self.canvas = tk.Canvas(self.root, bg='black', height=450)
         self.canvas.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.renderer = FrameRenderer(self.canvas)
+        self.renderer.metrics = self.metrics
         
         # Control frame
         control_frame = tk.Frame(self.root, bg='#2b2b2b')
@@ -76,6 +3067,15 @@ class VideoPlayer:
         self.progress_bar.bind("<ButtonPress-1>", self.on_progress_press)
         self.progress_bar.bind("<ButtonRelease-1>", self.on_progress_release)
         
+        # Audio waveform under the progress bar: click to seek, mouse wheel to zoom
+        self.waveform_canvas = tk.Canvas(control_frame, bg='#1e1e1e', height=40, highlightthickness=0)
+        self.waveform_canvas.pack(fill=tk.X)
+        self.waveform_canvas.bind("<Configure>", lambda event: self.draw_waveform())
+        self.waveform_canvas.bind("<Button-1>", self.on_waveform_click)
+        self.waveform_canvas.bind("<MouseWheel>", lambda event: self.zoom_waveform(event.x, 0.8 if event.delta > 0 else 1.25))
+        self.waveform_canvas.bind("<Button-4>", lambda event: self.zoom_waveform(event.x, 0.8))
+        self.waveform_canvas.bind("<Button-5>", lambda event: self.zoom_waveform(event.x, 1.25))
+        
         # Time labels
         time_frame = tk.Frame(control_frame, bg='#2b2b2b')
         time_frame.pack(fill=tk.X, pady=2)
@@ -89,6 +3089,16 @@ class VideoPlayer:
         )
         self.time_label.pack()
         
+        # Decoder read-ahead buffer occupancy
+        self.buffer_label = tk.Label(
+            time_frame, 
+            text="", 
+            fg='#888', 
+            bg='#2b2b2b',
+            font=('Arial', 8)
+        )
+        self.buffer_label.pack()
+        
         # Button frame
         button_frame = tk.Frame(control_frame, bg='#2b2b2b')
         button_frame.pack(pady=10)
@@ -96,6 +3106,9 @@ class VideoPlayer:
         # Playback buttons
         btn_style = {'bg': '#404040', 'fg': 'white', 'padx': 10, 'pady': 5, 'relief': tk.RAISED}
         
+        self.btn_prev_shot = tk.Button(button_frame, text="|◄ Shot", command=self.prev_shot, **btn_style)
+        self.btn_prev_shot.pack(side=tk.LEFT, padx=2)
+        
         self.btn_prev_frame = tk.Button(button_frame, text="◄◄", command=self.prev_frame, **btn_style)
         self.btn_prev_frame.pack(side=tk.LEFT, padx=2)
         
@@ -111,10 +3124,26 @@ class VideoPlayer:
         self.btn_next_frame = tk.Button(button_frame, text="►►", command=self.next_frame, **btn_style)
         self.btn_next_frame.pack(side=tk.LEFT, padx=2)
         
+        self.btn_next_shot = tk.Button(button_frame, text="Shot ►|", command=self.next_shot, **btn_style)
+        self.btn_next_shot.pack(side=tk.LEFT, padx=2)
+        
         # Capture frame button
         self.btn_capture = tk.Button(button_frame, text="📷 Capture", command=self.capture_frame, bg='#4CAF50', fg='white', padx=10, pady=5)
         self.btn_capture.pack(side=tk.LEFT, padx=10)
         
+        # Range marks and batch export
+        self.btn_mark_in = tk.Button(button_frame, text="[ In", command=self.set_mark_in, **btn_style)
+        self.btn_mark_in.pack(side=tk.LEFT, padx=2)
+        
+        self.btn_mark_out = tk.Button(button_frame, text="Out ]", command=self.set_mark_out, **btn_style)
+        self.btn_mark_out.pack(side=tk.LEFT, padx=2)
+        
+        self.btn_loop = tk.Button(button_frame, text="🔁 Loop", command=self.toggle_loop, **btn_style)
+        self.btn_loop.pack(side=tk.LEFT, padx=2)
+        
+        self.btn_export = tk.Button(button_frame, text="🎞 Export", command=self.export_frames, bg='#4CAF50', fg='white', padx=10, pady=5)
+        self.btn_export.pack(side=tk.LEFT, padx=10)
+        
         # Speed control frame
         speed_frame = tk.Frame(control_frame, bg='#2b2b2b')
         speed_frame.pack(pady=10)
@@ -137,13 +3166,29 @@ class VideoPlayer:
         self.speed_label = tk.Label(speed_frame, text="1.0x", fg='#4CAF50', bg='#2b2b2b', font=('Arial', 10, 'bold'))
         self.speed_label.pack(side=tk.LEFT, padx=10)
         
+        # Stats overlay and trace export
+        self.btn_stats = tk.Button(speed_frame, text="📊 Stats", command=self.toggle_overlay, bg='#404040', fg='white', padx=8, pady=3)
+        self.btn_stats.pack(side=tk.LEFT, padx=2)
+        
+        self.btn_proxy = tk.Button(speed_frame, text="🎞 Proxy", command=self.toggle_proxy, bg='#404040', fg='white', padx=8, pady=3)
+        self.btn_proxy.pack(side=tk.LEFT, padx=2)
+        
+        self.btn_export_stats = tk.Button(speed_frame, text="💾 Trace", command=self.export_metrics, bg='#404040', fg='white', padx=8, pady=3)
+        self.btn_export_stats.pack(side=tk.LEFT, padx=2)
+        
         # Audio status label
         self.audio_status = tk.Label(control_frame, text="", fg='#888', bg='#2b2b2b', font=('Arial', 9))
         self.audio_status.pack(pady=2)
         
-        # File selection button
+        # File selection and playlist buttons
+        file_frame = tk.Frame(control_frame, bg='#2b2b2b')
+        file_frame.pack(pady=10)
+        
+        self.btn_prev_item = tk.Button(file_frame, text="⏮ Prev Item", command=lambda: self.play_item(self.playlist_pos - 1), **btn_style)
+        self.btn_prev_item.pack(side=tk.LEFT, padx=2)
+        
         self.btn_open = tk.Button(
-            control_frame, 
+            file_frame, 
             text="📁 Open Video File", 
             command=self.open_video,
             bg='#2196F3', 
@@ -152,7 +3197,13 @@ class VideoPlayer:
             pady=8,
             font=('Arial', 10, 'bold')
         )
-        self.btn_open.pack(pady=10)
+        self.btn_open.pack(side=tk.LEFT, padx=5)
+        
+        self.btn_add = tk.Button(file_frame, text="➕ Add to Playlist", command=self.add_to_playlist, **btn_style)
+        self.btn_add.pack(side=tk.LEFT, padx=2)
+        
+        self.btn_next_item = tk.Button(file_frame, text="Next Item ⏭", command=lambda: self.play_item(self.playlist_pos + 1), **btn_style)
+        self.btn_next_item.pack(side=tk.LEFT, padx=2)
         
         # File name label
         self.file_label = tk.Label(control_frame, text="No video loaded", fg='#888', bg='#2b2b2b', font=('Arial', 9))
@@ -168,129 +3219,409 @@ class VideoPlayer:
         )
         
         if file_path:
-            self.load_video(file_path)
-            
-    def extract_audio(self, video_path):
-        """Extract audio from video file using moviepy"""
-        try:
-            self.audio_status.config(text="Extracting audio...", fg='yellow')
-            self.root.update()
-            
-            # Create a temporary file for audio
-            temp_dir = tempfile.gettempdir()
-            self.temp_audio_file = os.path.join(temp_dir, "temp_audio.wav")
+            self.open_path(file_path)
+    
+    def open_path(self, file_path):
+        """Opening a single file starts a new playlist with just that file"""
+        self.cancel_preload()
+        self.playlist = [file_path]
+        self.playlist_pos = 0
+        self.load_video(file_path)
+    
+    def add_to_playlist(self):
+        file_paths = filedialog.askopenfilenames(
+            title="Add Videos to Playlist",
+            filetypes=[
+                ("Video files", "*.mp4 *.avi *.mov *.mkv *.wmv *.flv *.webm"),
+                ("All files", "*.*")
+            ]
+        )
+        if not file_paths:
+            return
+        
+        self.playlist.extend(file_paths)
+        if self.video is None and self.loader is None:
+            self.play_item(max(0, self.playlist_pos))
+        else:
+            self.update_playlist_label()
+            self.start_preload()
+    
+    def play_item(self, pos, autoplay=None):
+        """Switch to a playlist item, using the preloaded one if it is ready"""
+        if not 0 <= pos < len(self.playlist):
+            return
+        if autoplay is None:
+            autoplay = self.is_playing
+        
+        self.playlist_pos = pos
+        path = self.playlist[pos]
+        preloader = self.preloader
+        self.preloader = None
+        
+        if preloader is not None and preloader.path == path:
+            if self.is_playing:
+                self.toggle_play()
+            if self.loader is not None:
+                self.loader.cancel()
+            preloader.autoplay = autoplay
             
-            # Remove old temp file if exists
-            if os.path.exists(self.temp_audio_file):
-                try:
-                    os.remove(self.temp_audio_file)
-                except:
-                    pass
+            if preloader.first_frame is not None:
+                self.loader = preloader
+                self.on_load_ready(preloader)
+                return
             
-            # Extract audio using moviepy
-            video_clip = VideoFileClip(video_path)
+            # Still opening: it becomes the current load and reports like one
+            if preloader.thread.is_alive():
+                preloader.on_progress = lambda loader, stage: self.root.after(0, self.on_load_progress, loader, stage)
+                preloader.on_failed = lambda loader, message: self.root.after(0, self.on_load_failed, loader, message)
+                self.loader = preloader
+                return
+        
+        if preloader is not None:
+            preloader.cancel()
+            preloader.discard()
+        self.load_video(path)
+        self.loader.autoplay = autoplay
+    
+    def start_preload(self):
+        """Open the next playlist item, decode its first frames and extract its audio in the background"""
+        pos = self.playlist_pos + 1
+        if pos >= len(self.playlist):
+            return
+        path = self.playlist[pos]
+        if self.preloader is not None:
+            if self.preloader.path == path:
+                return
+            self.cancel_preload()
+        
+        decoder_class = ProcessFrameDecoder if self.decode_in_process else FrameDecoder
+        self.preloader = VideoLoader(
+            path, 
+            decoder_class, 
+            self.frame_cache_bytes, 
+            media_cache=self.media_cache, 
+            on_ready=lambda loader: self.root.after(0, self.on_preload_ready, loader), 
+            max_buffer_bytes=self.preload_max_bytes
+        )
+    
+    def on_preload_ready(self, loader):
+        # Preloads adopted before they finished are shown right away
+        if loader is self.loader:
+            self.on_load_ready(loader)
+            return
+        if loader is not self.preloader:
+            return
+        
+        # Audio goes to a disk-backed store, only the video read-ahead counts against the budget
+        loader.audio_extractor = AudioExtractor(loader.path, cache=self.media_cache, key=loader.media_key)
+    
+    def cancel_preload(self):
+        if self.preloader is not None:
+            self.preloader.cancel()
+            if self.preloader.first_frame is not None:
+                self.preloader.discard()
+            self.preloader = None
+    
+    def update_playlist_label(self):
+        if self.video_path is None:
+            return
+        text = os.path.basename(self.video_path)
+        if len(self.playlist) > 1:
+            text += f"  ({self.playlist_pos + 1}/{len(self.playlist)})"
+        self.file_label.config(text=text, fg='white')
             
-            if video_clip.audio is not None:
-                video_clip.audio.write_audiofile(self.temp_audio_file, verbose=False, logger=None)
-                video_clip.close()
-                
-                # Load audio data
-                self.load_audio_data(self.temp_audio_file)
-                self.has_audio = True
-                self.audio_status.config(text="✓ Audio loaded (supports all speeds)", fg='#4CAF50')
-                return True
-            else:
-                video_clip.close()
-                self.audio_status.config(text="No audio track in video", fg='#888')
-                return False
-                
-        except Exception as e:
-            print(f"Audio extraction error: {e}")
-            self.audio_status.config(text="Audio extraction failed", fg='#ff6b6b')
-            return False
+    def extract_audio(self, video_path, extractor=None):
+        """Start decoding the soundtrack in the background, playback may begin before it finishes
+        
+        An extractor started ahead of time by playlist preloading is adopted
+        instead of starting a new one.
+        """
+        # Stop everything reading the old store first, it is closed once their threads have finished
+        readers = []
+        if self.peaks is not None:
+            self.peaks.cancel()
+            readers.append(self.peaks.thread)
+            self.peaks = None
+        if self.audio_engine is not None:
+            # Detach from the playback worker, the stream closes once the worker has let go of it
+            self.playback.attach_audio(None)
+            self.after_playback_idle(self.audio_engine.close)
+            readers.append(self.audio_engine.thread)
+            self.audio_engine = None
+        if self.audio_extractor is not None:
+            self.after_threads_exit(readers, self.audio_extractor.cancel)
+        self.waveform_view = None
+        self.draw_waveform()
+        
+        self.has_audio = False
+        self.audio_store = None
+        self.audio_status.config(text="Extracting audio...", fg='yellow')
+        
+        callbacks = dict(
+            on_ready=lambda store: self.root.after(0, lambda: self.on_audio_ready(extractor, store)),
+            on_progress=lambda progress: self.root.after(0, lambda: self.on_audio_progress(extractor, progress)),
+            on_done=lambda store: self.root.after(0, lambda: self.on_audio_done(extractor))
+        )
+        if extractor is None:
+            extractor = AudioExtractor(video_path, cache=self.media_cache, key=self.media_key, **callbacks)
+        else:
+            extractor.attach(**callbacks)
+        self.audio_extractor = extractor
+    
+    def on_audio_ready(self, extractor, store):
+        """Attach the growing audio store once the soundtrack has been probed"""
+        if extractor is not self.audio_extractor:
+            return
+        
+        if store is None:
+            self.audio_status.config(text="No audio track in video", fg='#888')
+            return
+        
+        self.audio_store = store
+        store.request(int(self.frame_time(self.current_frame) * store.sample_rate))
+        
+        # Waveform peaks fill in as chunks are decoded
+        self.peaks = PeakPyramid(store, on_update=lambda peaks: self.root.after(0, self.on_peaks_update, peaks))
+        self.has_audio = True
+        
+        # Audio joins playback in progress if the user pressed play before it was ready,
+        # otherwise the device is opened on the first play
+        if self.is_playing:
+            self.open_audio_device()
     
-    def load_audio_data(self, audio_file):
-        """Load audio data into memory"""
+    def open_audio_device(self):
+        """Start the output stream for the soundtrack the first time playback needs it"""
+        if not self.has_audio or self.audio_engine is not None:
+            return
+        
         try:
-            with wave.open(audio_file, 'rb') as wf:
-                self.audio_sample_rate = wf.getframerate()
-                frames = wf.readframes(wf.getnframes())
-                self.audio_data = np.frombuffer(frames, dtype=np.int16)
-                
-                # Convert to float for processing
-                self.audio_data = self.audio_data.astype(np.float32) / 32768.0
-                
-                # Handle stereo
-                if wf.getnchannels() == 2:
-                    self.audio_data = self.audio_data.reshape(-1, 2)
+            self.audio_engine = AudioEngine(self.audio_store)
         except Exception as e:
-            print(f"Error loading audio data: {e}")
+            print(f"Audio device error: {e}")
+            self.audio_status.config(text="Audio device unavailable", fg='#ff6b6b')
             self.has_audio = False
+            return
+        self.audio_engine.metrics = self.metrics
+        self.attach_loop_audio()
+        self.playback.attach_audio(self.audio_engine)
+    
+    def on_audio_progress(self, extractor, progress):
+        if extractor is not self.audio_extractor or progress >= 1.0:
+            return
+        self.audio_status.config(text=f"Extracting audio... {progress * 100:.0f}%", fg='yellow')
+    
+    def on_audio_done(self, extractor):
+        if extractor is not self.audio_extractor:
+            return
+        self.audio_status.config(text="✓ Audio loaded (supports all speeds)", fg='#4CAF50')
             
     def load_video(self, path):
+        """Start opening a file in the background, the window stays responsive until it is ready"""
         # Stop current playback
         if self.is_playing:
             self.toggle_play()
         
-        # Stop audio
-        self.stop_audio()
+        # Opening another file abandons a load still in progress
+        if self.loader is not None:
+            self.loader.cancel()
+        
+        decoder_class = ProcessFrameDecoder if self.decode_in_process else FrameDecoder
+        self.loader = VideoLoader(
+            path, 
+            decoder_class, 
+            self.frame_cache_bytes, 
+            media_cache=self.media_cache, 
+            on_progress=lambda loader, stage: self.root.after(0, self.on_load_progress, loader, stage), 
+            on_ready=lambda loader: self.root.after(0, self.on_load_ready, loader), 
+            on_failed=lambda loader, message: self.root.after(0, self.on_load_failed, loader, message)
+        )
+    
+    def on_load_progress(self, loader, stage):
+        if loader is not self.loader:
+            return
+        self.file_label.config(text=f"Loading {os.path.basename(loader.path)}: {stage}...", fg='yellow')
+        if self.startup is not None:
+            self.startup.mark(f"load: {stage}")
+    
+    def on_load_failed(self, loader, message):
+        if loader is not self.loader:
+            return
+        self.loader = None
+        self.file_label.config(text=f"{message}: {os.path.basename(loader.path)}", fg='#ff6b6b')
+        if self.startup is not None:
+            self.startup.mark('load failed')
+            self.finish_startup_profile()
+    
+    def on_load_ready(self, loader):
+        """Swap in the loaded video once the playback worker has stopped presenting the current one"""
+        if loader is not self.loader:
+            loader.discard()
+            return
+        if self.is_playing:
+            self.toggle_play()
+        self.after_playback_idle(lambda: self.show_loaded_video(loader))
+    
+    def show_loaded_video(self, loader):
+        """Swap in the loaded video, show its first frame, then start the background analysis and audio"""
+        if loader is not self.loader:
+            loader.discard()
+            return
+        self.loader = None
+        path = loader.path
+        
+        # Stop the previous decoder and index build
+        if self.decoder is not None:
+            self.decoder.close()
+        if self.video is not None:
+            self.video.release()
+        if self.frame_index is not None:
+            self.frame_index.cancel()
+        if self.thumbnails is not None:
+            self.thumbnails.cancel()
+        if self.shots is not None:
+            self.shots.cancel()
+        self.stop_proxy()
         
-        # Load new video
-        self.video = cv2.VideoCapture(path)
-        self.total_frames = int(self.video.get(cv2.CAP_PROP_FRAME_COUNT))
-        self.fps = self.video.get(cv2.CAP_PROP_FPS)
+        # Video playback is possible from here on
+        self.video = loader.video
+        self.decoder = loader.decoder
+        self.decoder.metrics = self.metrics
+        self.total_frames = loader.total_frames
+        self.fps = loader.fps
         self.current_frame = 0
         self.video_path = path
-        
-        # Extract and load audio
-        self.has_audio = self.extract_audio(path)
-        
-        # Update UI
-        self.file_label.config(text=os.path.basename(path), fg='white')
-        self.progress_bar.config(to=self.total_frames - 1)
+        self.mark_in = None
+        self.mark_out = None
+        self.clear_loop()
+        self.media_key = loader.media_key
         
         # Display first frame
+        self.update_playlist_label()
+        self.progress_bar.config(to=self.total_frames - 1)
         self.show_frame()
         self.update_time_label()
+        self.metrics.record('first_frame_ms', (time.perf_counter() - loader.started) * 1000)
+        if self.startup is not None:
+            self.root.update_idletasks()
+            self.startup.mark('first frame shown')
+        
+        # Build the keyframe/timestamp index in the background, or take it from the media cache
+        self.frame_index = FrameIndex(
+            path, 
+            self.fps, 
+            on_ready=lambda: self.root.after(0, self.on_index_ready), 
+            cache=self.media_cache, 
+            key=self.media_key
+        )
+        
+        # Build the scrub preview strip in the background
+        self.thumbnails = ThumbnailStrip(
+            path, 
+            self.total_frames, 
+            self.fps, 
+            interval=self.thumbnail_interval, 
+            max_bytes=self.thumbnail_max_bytes, 
+            width=self.thumbnail_width, 
+            index=self.frame_index, 
+            cache=self.media_cache, 
+            key=self.media_key, 
+            frame_size=loader.frame_size
+        )
+        
+        # Find shot boundaries in the background, or take them from the media cache
+        self.shots = ShotDetector(
+            path, 
+            self.fps, 
+            cache=self.media_cache, 
+            key=self.media_key, 
+            on_done=lambda shots: self.root.after(0, self.update_buffer_label)
+        )
+        
+        if self.proxy_mode:
+            self.start_proxy()
+        
+        # Extract audio in the background, it joins playback when ready
+        extractor = loader.audio_extractor
+        loader.audio_extractor = None
+        self.extract_audio(path, extractor)
+        
+        # A preloaded decoder kept its read-ahead small, give it the full buffer now
+        if loader.max_buffer_bytes is not None:
+            self.decoder.set_capacity(type(self.decoder).DEFAULT_CAPACITY)
+        
+        if loader.autoplay:
+            self.toggle_play()
+        self.start_preload()
+        
+        if self.startup is not None:
+            self.finish_startup_profile()
+    
+    def finish_startup_profile(self):
+        """Print the startup timeline and leave the main loop"""
+        print(self.startup.report())
+        self.root.after(0, self.root.quit)
+        
+    def on_index_ready(self):
+        """Switch frame count, seeking and timing over to the real timestamps"""
+        index = self.frame_index
+        if index is None or not index.ready or self.decoder is None:
+            return
         
-    def show_frame(self):
+        self.total_frames = index.frame_count
+        self.decoder.index = index
+        self.current_frame = min(self.current_frame, self.total_frames - 1)
+        self.progress_bar.config(to=self.total_frames - 1)
+        self.update_time_label()
+    
+    def frame_time(self, frame):
+        """Presentation time of a frame in seconds"""
+        if self.frame_index is not None and self.frame_index.ready:
+            return self.frame_index.time_of(frame)
+        return frame / self.fps
+    
+    def frame_at_time(self, seconds):
+        """Frame displayed at the given time in seconds"""
+        if self.frame_index is not None and self.frame_index.ready:
+            return self.frame_index.frame_at(seconds)
+        return int(seconds * self.fps)
+    
+    def duration(self):
+        if self.frame_index is not None and self.frame_index.ready:
+            return self.frame_index.duration
+        return self.total_frames / self.fps
+    
+    def show_frame(self, backward=False):
         if self.video is None:
             return
         
         try:
-            self.video.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
-            ret, frame = self.video.read()
+            # Frames of a cached loop are already scaled and converted
+            if self.loop_cache is not None and self.renderer.canvas_size == (self.canvas.winfo_width(), self.canvas.winfo_height()):
+                rgba = self.loop_cache.get(self.current_frame, self.renderer.canvas_size)
+                if rgba is not None:
+                    self.renderer.draw_prepared(rgba)
+                    return
             
-            if not ret:
+            started = time.perf_counter()
+            frame = self.frame_source().get_frame(self.current_frame, backward=backward)
+            self.metrics.record('frame_wait_ms', (time.perf_counter() - started) * 1000)
+            
+            if frame is None:
+                self.metrics.count('missing_frames')
                 return
             
-            # Convert BGR to RGB
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Resize to fit canvas
-            canvas_width = self.canvas.winfo_width()
-            canvas_height = self.canvas.winfo_height()
-            
-            if canvas_width > 1 and canvas_height > 1:
-                h, w = frame.shape[:2]
-                scale = min(canvas_width/w, canvas_height/h)
-                new_w, new_h = int(w*scale), int(h*scale)
-                frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
-            
-            # Convert to PhotoImage and keep reference
-            img = Image.fromarray(frame)
-            self.photo = ImageTk.PhotoImage(image=img)
-            
-            # Display on canvas
-            self.canvas.delete("all")
-            self.canvas.create_image(
-                canvas_width//2, 
-                canvas_height//2, 
-                image=self.photo, 
-                anchor=tk.CENTER
-            )
+            self.renderer.draw(frame)
         except Exception as e:
-            pass
+            self.metrics.count('display_errors')
+            print(f"Display error: {e}")
+    
+    def display_image(self, frame):
+        """Scale an RGB image to fit the canvas and draw it"""
+        try:
+            self.renderer.draw(frame, bgr=False)
+        except Exception as e:
+            self.metrics.count('display_errors')
+            print(f"Display error: {e}")
             
     def toggle_play(self):
         if self.video is None:
@@ -300,321 +3631,267 @@ class VideoPlayer:
         
         if self.is_playing:
             self.btn_play_pause.config(text="⏸ Pause")
-            
-            # Start audio playback
-            if self.has_audio:
-                self.start_audio()
-            
-            self.stop_thread = False
-            self.video_thread = threading.Thread(target=self.play_video)
-            self.video_thread.daemon = True
-            self.video_thread.start()
+            self.open_audio_device()
+            self.playback.resume()
         else:
             self.btn_play_pause.config(text="▶ Play")
-            self.stop_thread = True
+            self.playback.pause()
             
-            # Stop audio
-            self.stop_audio()
+            # Replace the last proxy frame with the full-resolution one
+            if self.proxy_decoder is not None:
+                self.show_frame()
     
-    def start_audio(self):
-        """Start audio playback with speed adjustment"""
-        if not self.has_audio or self.audio_data is None:
-            return
+    def on_playback_end(self):
+        """The worker reached the last frame, continue with the next playlist item if there is one"""
+        self.is_playing = False
+        self.btn_play_pause.config(text="▶ Play")
+        if self.proxy_decoder is not None:
+            self.show_frame()
+        if self.playlist_pos + 1 < len(self.playlist):
+            self.play_item(self.playlist_pos + 1, autoplay=True)
+    
+    def present_frame(self, target, deadline, backward=False, wrapped=False):
+        """Move the playhead to target and make sure exactly one display update is queued
         
-        try:
-            # Calculate audio position based on current frame
-            current_time = self.current_frame / self.fps
-            self.audio_position = int(current_time * self.audio_sample_rate)
-            
-            # Start audio thread (processing happens in background)
-            self.stop_audio()
-            self.audio_thread = threading.Thread(target=self.play_audio_thread)
-            self.audio_thread.daemon = True
-            self.audio_thread.start()
-        except Exception as e:
-            print(f"Error starting audio: {e}")
+        Frames passed over are never decoded beyond grab(), and if the previous
+        update has not run yet it simply draws this newer frame instead.
+        Seeks and steps pass no deadline and are not counted in the stats, a
+        loop wrap counts as advancing by one frame.
+        """
+        if deadline is not None:
+            stats = self.current_frame_stats()
+            advanced = 1 if wrapped else target - self.current_frame
+            stats['advanced'] += advanced
+            if advanced > 1:
+                self.metrics.count('dropped_frames', advanced - 1)
+        self.current_frame = target
+        self.display_deadline = deadline
+        self.display_backward = backward
+        if self.decoder is not None and deadline is not None and not self.in_loop_cache(target):
+            self.frame_source().playhead = target
+        
+        if not self.display_pending:
+            self.display_pending = True
+            self.display_requested = time.perf_counter()
+            self.root.after_idle(self.update_display)
     
-    def play_audio_thread(self):
-        """Play audio in separate thread with speed adjustment"""
-        try:
-            # At 1.0x speed, play continuously without chunking for smooth audio
-            if self.playback_speed == 1.0:
-                # Get current video position
-                current_time = self.current_frame / self.fps
-                start_sample = int(current_time * self.audio_sample_rate)
-                
-                # Check bounds
-                if start_sample >= len(self.audio_data):
-                    return
-                
-                # Play entire remaining audio
-                audio_segment = self.audio_data[start_sample:]
-                sd.play(audio_segment, self.audio_sample_rate, blocking=False)
-                
-                # Keep monitoring for stop signal
-                while self.is_playing and not self.stop_thread:
-                    if not sd.get_stream().active:
-                        break
-                    time.sleep(0.1)
-                
-            else:
-                # For non-1.0x speeds, use chunked playback with sync
-                chunk_duration = 1.0
-                last_end_sample = 0
-                
-                while self.is_playing and not self.stop_thread:
-                    # Get current video position
-                    current_time = self.current_frame / self.fps
-                    start_sample = int(current_time * self.audio_sample_rate)
-                    
-                    # Use continuity from previous chunk
-                    if last_end_sample > 0 and abs(start_sample - last_end_sample) < self.audio_sample_rate * 0.2:
-                        start_sample = last_end_sample
-                    
-                    # Calculate chunk size
-                    chunk_size = int(chunk_duration * self.audio_sample_rate)
-                    end_sample = start_sample + chunk_size
-                    
-                    # Check bounds
-                    if start_sample >= len(self.audio_data):
-                        break
-                    
-                    if end_sample > len(self.audio_data):
-                        end_sample = len(self.audio_data)
-                    
-                    audio_chunk = self.audio_data[start_sample:end_sample]
-                    
-                    if len(audio_chunk) == 0:
-                        break
-                    
-                    # Apply speed change
-                    audio_chunk = self.resample_audio_segment(audio_chunk, self.playback_speed)
-                    
-                    # Play chunk
-                    sd.play(audio_chunk, self.audio_sample_rate, blocking=False)
-                    
-                    last_end_sample = end_sample
-                    
-                    # Wait for most of chunk to play
-                    chunk_play_time = len(audio_chunk) / self.audio_sample_rate
-                    wait_time = chunk_play_time * 0.9
-                    sleep_intervals = int(wait_time / 0.1)
-                    for _ in range(max(1, sleep_intervals)):
-                        if self.stop_thread or not self.is_playing:
-                            sd.stop()
-                            return
-                        time.sleep(0.1)
-            
-        except Exception as e:
-            print(f"Audio playback error: {e}")
-        finally:
-            try:
-                sd.stop()
-            except:
-                pass
+    def frame_source(self):
+        """Decoder to show frames from: the proxy while playing or scrubbing, the full-resolution source otherwise"""
+        if self.proxy_decoder is not None and (self.is_playing or self.seeking):
+            return self.proxy_decoder
+        return self.decoder
     
-    def resample_audio_segment(self, audio_segment, speed):
-        """Resample a segment of audio for speed change"""
-        try:
-            # Calculate new length
-            new_length = int(len(audio_segment) / speed)
-            
-            # Handle stereo vs mono
-            if len(audio_segment.shape) == 2:
-                # Stereo
-                resampled_left = signal.resample(audio_segment[:, 0], new_length)
-                resampled_right = signal.resample(audio_segment[:, 1], new_length)
-                return np.column_stack((resampled_left, resampled_right))
-            else:
-                # Mono
-                return signal.resample(audio_segment, new_length)
-        except Exception as e:
-            print(f"Error resampling audio: {e}")
-            return audio_segment
+    def in_loop_cache(self, frame):
+        """The frame will be shown from the loop cache, so the decoder does not need to follow it"""
+        return self.loop_cache is not None and self.loop_cache.get(frame, self.renderer.canvas_size) is not None
     
-    def stop_audio(self):
-        """Stop audio playback"""
-        try:
-            sd.stop()
-            # Wait a bit for audio to fully stop
-            time.sleep(0.05)
-        except:
-            pass
+    def current_frame_stats(self):
+        """Presentation counters for the current speed"""
+        if self.playback_speed not in self.frame_stats:
+            self.frame_stats[self.playback_speed] = {'advanced': 0, 'presented': 0, 'late': 0}
+        return self.frame_stats[self.playback_speed]
     
-    def change_audio_speed(self, audio_data, speed):
-        """Change audio speed using resampling - kept for compatibility"""
-        if speed == 1.0:
-            return audio_data
-        
-        try:
-            # Calculate new length
-            new_length = int(len(audio_data) / speed)
-            
-            # Handle stereo vs mono
-            if len(audio_data.shape) == 2:
-                # Stereo
-                resampled_left = signal.resample(audio_data[:, 0], new_length)
-                resampled_right = signal.resample(audio_data[:, 1], new_length)
-                return np.column_stack((resampled_left, resampled_right))
-            else:
-                # Mono
-                return signal.resample(audio_data, new_length)
-        except Exception as e:
-            print(f"Error changing audio speed: {e}")
-            return audio_data
-            
-    def play_video(self):
-        frame_time = 1.0 / self.fps
-        
-        while self.is_playing and self.current_frame < self.total_frames - 1:
-            if self.stop_thread:
-                break
-            
-            loop_start = time.time()
-            
-            # Update frame
-            self.current_frame += 1
-            
-            # Schedule display update and wait for it to complete
-            self.root.after_idle(self.update_display)
-            
-            # Calculate timing
-            target_delay = frame_time / self.playback_speed
-            elapsed = time.time() - loop_start
-            sleep_time = max(0, target_delay - elapsed)
-            
-            # Use smaller sleep intervals to keep GUI responsive
-            if sleep_time > 0:
-                sleep_chunks = int(sleep_time / 0.01) + 1
-                chunk_time = sleep_time / sleep_chunks
-                for _ in range(sleep_chunks):
-                    if self.stop_thread:
-                        break
-                    time.sleep(chunk_time)
-        
-        if self.current_frame >= self.total_frames - 1:
-            self.is_playing = False
-            self.root.after(0, lambda: self.btn_play_pause.config(text="▶ Play"))
-            self.stop_audio()
+    def dropped_frames(self):
+        stats = self.current_frame_stats()
+        return stats['advanced'] - stats['presented']
     
     def update_display(self):
         """Update display in main thread to prevent flickering"""
+        self.display_pending = False
+        self.metrics.record('tk_latency_ms', (time.perf_counter() - self.display_requested) * 1000)
         if not self.seeking:
-            self.show_frame()
+            self.show_frame(backward=self.display_backward)
+            
+            if self.display_deadline is not None:
+                stats = self.current_frame_stats()
+                stats['presented'] += 1
+                if time.perf_counter() > self.display_deadline:
+                    stats['late'] += 1
+                    self.metrics.count('late_frames')
+                self.scheduler.record_presentation(self.frame_time(self.current_frame))
+                self.metrics.record('queue_depth', self.frame_source().occupancy()[0])
+            
+            # Measure how far the shown frame is from what is being heard
+            if self.has_audio and self.audio_engine is not None and self.audio_engine.running:
+                self.av_drift = self.frame_time(self.current_frame) - self.audio_engine.clock()
+                self.metrics.record('av_offset_ms', self.av_drift * 1000)
+
             self.progress_var.set(self.current_frame)
             self.update_time_label()
+            self.update_buffer_label()
+            
+            self.update_waveform_cursor()
+            
+            # The overlay is refreshed a few times a second, not per frame
+            if self.overlay_visible and time.perf_counter() - self.overlay_updated > 0.25:
+                self.update_overlay()
+    
+    def update_buffer_label(self):
+        """Show how far the decoder is ahead of the playhead"""
+        if self.decoder is None:
+            return
+        
+        buffered, capacity = self.decoder.occupancy()
+        hit_rate = self.decoder.cache.hit_rate() * 100
+        color = '#ff6b6b' if self.is_playing and buffered == 0 else '#888'
+        text = f"Buffer: {buffered}/{capacity}  Cache hits: {hit_rate:.0f}%"
+        if self.is_playing:
+            text += f"  Dropped: {self.dropped_frames()}  Late: {self.current_frame_stats()['late']}"
+            text += f"  Jitter: {self.scheduler.stats()['jitter_mean_ms']:.1f} ms"
+        if self.has_audio and self.is_playing:
+            text += f"  A/V: {self.av_drift * 1000:+.0f} ms"
+        if self.loop_cache is not None:
+            if not self.loop_cache.fits:
+                text += "  Loop: streaming"
+            elif not self.loop_cache.ready:
+                text += f"  Loop: caching {self.loop_cache.decoded}/{self.loop_cache.frame_count}"
+            else:
+                text += f"  Loop: in RAM ({self.loop_cache.nbytes / (1024 * 1024):.0f} MB)"
+        if self.proxy is not None:
+            text += "  Proxy: on" if self.proxy_decoder is not None else f"  Proxy: {self.proxy.progress.value * 100:.0f}%"
+        if self.shots is not None:
+            text += f"  Shots: {len(self.shots.boundaries) + 1}"
+            if not self.shots.ready:
+                text += f" ({self.shots.progress() * 100:.0f}% analyzed)"
+        self.buffer_label.config(text=text, fg=color)
             
+    def toggle_overlay(self):
+        """Show or hide the per-stage stats on top of the video"""
+        self.overlay_visible = not self.overlay_visible
+        if self.overlay_visible:
+            self.update_overlay()
+        elif self.overlay_item is not None:
+            self.canvas.delete(self.overlay_item)
+            self.overlay_item = None
+    
+    def update_overlay(self):
+        self.overlay_updated = time.perf_counter()
+        text = self.metrics.overlay_text()
+        if self.overlay_item is None:
+            self.overlay_item = self.canvas.create_text(
+                8, 
+                8, 
+                text=text, 
+                anchor=tk.NW, 
+                fill='#00ff00', 
+                font=('Courier', 9)
+            )
+        else:
+            self.canvas.itemconfig(self.overlay_item, text=text)
+        self.canvas.tag_raise(self.overlay_item)
+    
+    def export_metrics(self):
+        """Save the session's measurements as JSON (summaries, histograms and trace) or CSV (trace)"""
+        file_path = filedialog.asksaveasfilename(
+            title="Export Stats Trace",
+            defaultextension=".json",
+            filetypes=[
+                ("JSON", "*.json"),
+                ("CSV", "*.csv")
+            ],
+            initialfile="staria_trace.json"
+        )
+        if not file_path:
+            return
+        
+        try:
+            if file_path.lower().endswith('.csv'):
+                self.metrics.export_csv(file_path)
+            else:
+                self.metrics.export_json(file_path)
+            self.audio_status.config(text=f"✓ Trace saved: {os.path.basename(file_path)}", fg='#4CAF50')
+        except Exception as e:
+            print(f"Trace export error: {e}")
+            self.audio_status.config(text=f"Trace export failed: {e}", fg='#ff6b6b')
+    
     def next_frame(self):
         if self.video is None:
             return
         
-        was_playing = self.is_playing
-        if was_playing:
-            self.toggle_play()
-        
-        if self.current_frame < self.total_frames - 1:
-            self.current_frame += 1
-            self.show_frame()
-            self.progress_var.set(self.current_frame)
-            self.update_time_label()
+        self.step(1)
             
     def prev_frame(self):
         if self.video is None:
             return
         
-        was_playing = self.is_playing
-        if was_playing:
-            self.toggle_play()
-        
-        if self.current_frame > 0:
-            self.current_frame -= 1
-            self.show_frame()
-            self.progress_var.set(self.current_frame)
-            self.update_time_label()
+        self.step(-1)
+    
+    def step(self, delta):
+        """Pause and move by delta frames"""
+        if self.is_playing:
+            self.is_playing = False
+            self.btn_play_pause.config(text="▶ Play")
+        self.playback.step(delta)
             
-    def skip(self, seconds):
-        if self.video is None:
+    def next_shot(self):
+        """Jump to the start of the next shot found so far"""
+        if self.video is None or self.shots is None:
             return
         
-        was_playing = self.is_playing
-        if was_playing:
-            self.toggle_play()
+        frame = self.shots.next_shot(self.current_frame)
+        if frame is not None:
+            self.playback.seek(frame)
+    
+    def prev_shot(self):
+        """Jump to the start of the current shot, or the previous one when already at a start"""
+        if self.video is None or self.shots is None:
+            return
         
-        frames_to_skip = int(seconds * self.fps)
-        self.current_frame = max(0, min(self.current_frame + frames_to_skip, self.total_frames - 1))
-        self.show_frame()
-        self.progress_var.set(self.current_frame)
-        self.update_time_label()
+        self.playback.seek(self.shots.previous_shot(self.current_frame))
+    
+    def skip(self, seconds):
+        if self.video is None:
+            return
         
-        if was_playing:
-            self.toggle_play()
+        target_time = self.frame_time(self.current_frame) + seconds
+        self.playback.seek(max(0, min(self.frame_at_time(target_time), self.total_frames - 1)))
         
     def change_speed(self, speed):
-        was_playing = self.is_playing
-        
-        # Stop first to avoid conflicts
-        if was_playing:
-            self.stop_thread = True
-            self.stop_audio()
-            
-            # Wait for threads to finish
-            if self.video_thread and self.video_thread.is_alive():
-                self.video_thread.join(timeout=1.0)
-            if self.audio_thread and self.audio_thread.is_alive():
-                self.audio_thread.join(timeout=1.0)
-            
-            self.is_playing = False
-            self.btn_play_pause.config(text="▶ Play")
-        
-        # Change speed
+        # Change speed, the playback worker rebases its clocks without restarting
         self.playback_speed = speed
         self.speed_label.config(text=f"{speed}x")
+        self.playback.set_speed(speed)
         
-        # Restart if was playing
-        if was_playing:
-            # Reset flags
-            self.stop_thread = False
-            # Small delay to ensure clean restart
-            self.root.after(200, self.toggle_play)
+        # The cached loop audio is stretched again for the new speed, it streams meanwhile
+        if self.loop_cache is not None:
+            self.loop_cache.set_speed(speed)
     
     def on_progress_press(self, event):
         self.seeking = True
         if self.is_playing:
-            self.stop_audio()
+            self.playback.pause()
     
     def on_progress_release(self, event):
         self.seeking = False
         if self.video is None:
             return
         
-        was_playing = self.is_playing
-        if was_playing:
-            self.stop_thread = True
-            if self.video_thread:
-                self.video_thread.join(timeout=0.5)
-            self.is_playing = False
-        
-        self.current_frame = int(self.progress_var.get())
-        self.show_frame()
-        self.update_time_label()
-        
-        if was_playing:
-            self.toggle_play()
+        self.playback.seek(int(self.progress_var.get()))
+        if self.is_playing:
+            self.playback.resume()
         
     def on_progress_change(self, value):
         if self.video is None or not self.seeking:
             return
         
         self.current_frame = int(float(value))
-        self.show_frame()
+        
+        # Show the exact proxy frame, or the nearest preview thumbnail; the full frame is decoded on release
+        thumb = self.thumbnails.nearest(self.current_frame) if self.thumbnails is not None else None
+        if self.proxy_decoder is not None:
+            self.show_frame()
+        elif thumb is not None:
+            self.display_image(thumb)
+        else:
+            self.show_frame()
         self.update_time_label()
         
     def update_time_label(self):
         if self.video is None:
             return
         
-        current_time = self.current_frame / self.fps
-        total_time = self.total_frames / self.fps
+        current_time = self.frame_time(self.current_frame)
+        total_time = self.duration()
         
         current_str = self.format_time(current_time)
         total_str = self.format_time(total_time)
@@ -644,14 +3921,316 @@ class VideoPlayer:
         )
         
         if file_path:
-            self.video.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
-            ret, frame = self.video.read()
+            frame = self.decoder.get_frame(self.current_frame)
             
-            if ret:
+            if frame is not None:
                 cv2.imwrite(file_path, frame)
                 self.audio_status.config(text=f"✓ Frame saved: {os.path.basename(file_path)}", fg='#4CAF50')
                 self.root.after(3000, lambda: self.audio_status.config(text="✓ Audio loaded (supports all speeds)" if self.has_audio else "", fg='#4CAF50' if self.has_audio else '#888'))
     
+    def toggle_proxy(self):
+        """Switch proxy mode, applies to the open video and the ones opened after it"""
+        self.proxy_mode = not self.proxy_mode
+        self.btn_proxy.config(bg='#2196F3' if self.proxy_mode else '#404040')
+        if self.proxy_mode:
+            self.start_proxy()
+        else:
+            self.stop_proxy()
+            self.show_frame()
+        self.update_buffer_label()
+    
+    def start_proxy(self):
+        """Transcode a proxy of a large source in the background, or take it from the media cache"""
+        if self.video is None or self.proxy is not None or self.media_cache is None or self.media_key is None:
+            return
+        if self.video.get(cv2.CAP_PROP_FRAME_WIDTH) <= self.proxy_min_width:
+            return
+        
+        self.proxy = ProxyBuilder(
+            self.video_path, 
+            self.media_cache, 
+            self.media_key, 
+            width=self.proxy_width, 
+            on_ready=lambda proxy: self.root.after(0, self.on_proxy_ready, proxy)
+        )
+    
+    def on_proxy_ready(self, proxy):
+        """Playback and scrubbing switch to the proxy from the next frame on"""
+        if proxy is not self.proxy:
+            return
+        
+        self.proxy_decoder = FrameDecoder(proxy.proxy_path, cache_bytes=64 * 1024 * 1024)
+        self.proxy_decoder.metrics = self.metrics
+        self.update_buffer_label()
+    
+    def stop_proxy(self):
+        if self.proxy is not None:
+            self.proxy.cancel()
+            self.proxy = None
+        if self.proxy_decoder is not None:
+            # Frames come from the source decoder from now on, the proxy closes once the worker has let go of it
+            self.after_playback_idle(self.proxy_decoder.close)
+            self.proxy_decoder = None
+    
+    def after_playback_idle(self, callback):
+        """Run callback on the Tk thread once the playback worker has applied every command sent so far
+        
+        The Tk thread polls instead of joining the worker, which may itself be
+        waiting for the Tk thread.
+        """
+        applied = self.playback.barrier()
+        
+        def poll():
+            if applied.is_set():
+                callback()
+            else:
+                self.root.after(5, poll)
+        poll()
+    
+    def after_threads_exit(self, threads, callback):
+        """Run callback on the Tk thread once every thread in threads has finished, without joining them"""
+        def poll():
+            if any(thread.is_alive() for thread in threads):
+                self.root.after(20, poll)
+            else:
+                callback()
+        poll()
+    
+    def set_mark_in(self):
+        if self.video is None:
+            return
+        
+        self.mark_in = self.current_frame
+        if self.mark_out is not None and self.mark_out < self.mark_in:
+            self.mark_out = None
+        self.show_marks()
+    
+    def set_mark_out(self):
+        if self.video is None:
+            return
+        
+        self.mark_out = self.current_frame
+        if self.mark_in is not None and self.mark_in > self.mark_out:
+            self.mark_in = None
+        self.show_marks()
+    
+    def show_marks(self):
+        mark_in = self.format_time(self.frame_time(self.mark_in)) if self.mark_in is not None else "start"
+        mark_out = self.format_time(self.frame_time(self.mark_out)) if self.mark_out is not None else "end"
+        self.audio_status.config(text=f"Range: {mark_in} – {mark_out}", fg='white')
+    
+    def toggle_loop(self):
+        """Repeat the range between the in and out marks (the whole video without marks), or stop repeating"""
+        if self.video is None:
+            return
+        
+        if self.loop_range is not None:
+            self.clear_loop()
+            return
+        
+        first = self.mark_in if self.mark_in is not None else 0
+        last = self.mark_out if self.mark_out is not None else self.total_frames - 1
+        self.loop_range = (first, last)
+        self.playback.set_loop(self.loop_range)
+        self.btn_loop.config(bg='#2196F3')
+        self.build_loop_cache()
+        
+        if not first <= self.current_frame <= last:
+            self.playback.seek(first)
+    
+    def clear_loop(self):
+        self.loop_range = None
+        self.playback.set_loop(None)
+        if self.loop_cache is not None:
+            self.loop_cache.cancel()
+            self.loop_cache = None
+        if self.audio_engine is not None:
+            self.audio_engine.set_loop()
+        self.btn_loop.config(bg='#404040')
+    
+    def build_loop_cache(self):
+        """Decode the loop into RAM at the current display size, or stream it if it is over the budget"""
+        if self.loop_cache is not None:
+            self.loop_cache.cancel()
+            self.loop_cache = None
+        if self.loop_range is None or self.renderer.target_size is None:
+            return
+        
+        first, last = self.loop_range
+        self.loop_cache = LoopCache(
+            self.video_path, 
+            first, 
+            last, 
+            self.renderer.canvas_size, 
+            self.renderer.target_size, 
+            index=self.frame_index, 
+            speed=self.playback_speed, 
+            max_bytes=self.loop_max_bytes, 
+            on_ready=lambda cache: self.root.after(0, self.on_loop_ready, cache)
+        )
+        self.attach_loop_audio()
+        self.update_buffer_label()
+    
+    def attach_loop_audio(self):
+        """Bound the audio to the loop and have its cached copy stretched once the soundtrack is available"""
+        if self.loop_range is None or self.audio_engine is None:
+            return
+        
+        first, last = self.loop_range
+        rate = self.audio_store.sample_rate
+        start = int(self.frame_time(first) * rate)
+        end = min(int(self.playback.end_time(last) * rate), len(self.audio_store))
+        self.audio_engine.set_loop(start, end)
+        if self.loop_cache is not None:
+            self.loop_cache.set_audio(self.audio_store, start, end)
+    
+    def on_loop_ready(self, cache):
+        """The loop frames or its stretched audio are in RAM, hand the audio to the engine"""
+        if cache is not self.loop_cache:
+            return
+        
+        if cache.audio is not None and self.audio_engine is not None:
+            store, start, end = cache.audio_source
+            self.audio_engine.set_loop(start, end, cache.audio, cache.audio_speed)
+        self.update_buffer_label()
+    
+    def export_frames(self):
+        """Export every Nth frame between the in and out marks (whole video without marks)"""
+        if self.video is None:
+            return
+        
+        # Second press cancels a running export
+        if self.exporter is not None:
+            self.exporter.cancel()
+            return
+        
+        step = simpledialog.askinteger("Export Frames", "Export every Nth frame:", initialvalue=1, minvalue=1, parent=self.root)
+        if step is None:
+            return
+        
+        file_path = filedialog.asksaveasfilename(
+            title="Export Frames As",
+            defaultextension=".png",
+            filetypes=[
+                ("PNG Image", "*.png"),
+                ("JPEG Image", "*.jpg"),
+                ("BMP Image", "*.bmp")
+            ],
+            initialfile="frame.png"
+        )
+        if not file_path:
+            return
+        
+        prefix, extension = os.path.splitext(file_path)
+        start = self.mark_in if self.mark_in is not None else 0
+        end = self.mark_out if self.mark_out is not None else self.total_frames - 1
+        
+        self.exporter = FrameExporter(
+            self.video_path, 
+            prefix, 
+            extension, 
+            start, 
+            end, 
+            step=step, 
+            index=self.frame_index, 
+            on_progress=lambda exporter: self.root.after(0, self.on_export_progress, exporter), 
+            on_done=lambda exporter: self.root.after(0, self.on_export_done, exporter)
+        )
+        self.btn_export.config(text="✖ Cancel")
+    
+    def on_export_progress(self, exporter):
+        if exporter is not self.exporter:
+            return
+        
+        self.audio_status.config(
+            text=f"Exporting frames... {exporter.written}/{exporter.total} ({exporter.fps:.0f} frames/s)", 
+            fg='#FFA500'
+        )
+    
+    def on_export_done(self, exporter):
+        if exporter is not self.exporter:
+            return
+        
+        self.exporter = None
+        self.btn_export.config(text="🎞 Export")
+        
+        status = "cancelled" if exporter.cancelled else "done"
+        color = '#FFA500' if exporter.cancelled or exporter.failed else '#4CAF50'
+        text = f"✓ Export {status}: {exporter.written} frames in {exporter.elapsed:.1f}s ({exporter.fps:.0f} frames/s)"
+        if exporter.failed:
+            text += f", {exporter.failed} failed"
+        self.audio_status.config(text=text, fg=color)
+    
+    def on_peaks_update(self, peaks):
+        """Redraw as more of the waveform becomes available, a few times a second at most"""
+        if peaks is not self.peaks:
+            return
+        if peaks.complete or time.perf_counter() - self.waveform_drawn > 0.2:
+            self.draw_waveform()
+    
+    def waveform_range(self):
+        """Visible time range of the waveform strip in seconds"""
+        if self.waveform_view is not None:
+            return self.waveform_view
+        return 0.0, self.duration()
+    
+    def draw_waveform(self):
+        """Draw min/max peaks for the visible range as one polygon, cost depends on the width only"""
+        canvas = self.waveform_canvas
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        if self.peaks is None or self.audio_store is None or width < 2:
+            canvas.delete('waveform')
+            self.waveform_item = None
+            self.waveform_cursor = None
+            return
+        
+        self.waveform_drawn = time.perf_counter()
+        start, end = self.waveform_range()
+        rate = self.audio_store.sample_rate
+        mins, maxs = self.peaks.peaks(int(start * rate), int(end * rate), width)
+        
+        # Upper edge left to right, lower edge back right to left
+        mid = height / 2
+        x = np.arange(width, dtype=np.float64)
+        top = np.column_stack((x, mid - maxs * mid)).ravel()
+        bottom = np.column_stack((x[::-1], (mid - mins * mid)[::-1] + 1)).ravel()
+        coords = np.concatenate((top, bottom)).tolist()
+        
+        if self.waveform_item is None:
+            self.waveform_item = canvas.create_polygon(coords, fill='#4CAF50', outline='', tags='waveform')
+            self.waveform_cursor = canvas.create_line(0, 0, 0, height, fill='white', tags='waveform')
+        else:
+            canvas.coords(self.waveform_item, coords)
+        self.update_waveform_cursor()
+    
+    def update_waveform_cursor(self):
+        if self.waveform_cursor is None:
+            return
+        start, end = self.waveform_range()
+        width, height = self.waveform_canvas.winfo_width(), self.waveform_canvas.winfo_height()
+        x = (self.frame_time(self.current_frame) - start) / max(end - start, 1e-6) * width
+        self.waveform_canvas.coords(self.waveform_cursor, x, 0, x, height)
+    
+    def on_waveform_click(self, event):
+        if self.video is None:
+            return
+        start, end = self.waveform_range()
+        seconds = start + event.x / max(1, self.waveform_canvas.winfo_width()) * (end - start)
+        self.playback.seek(self.frame_at_time(seconds))
+    
+    def zoom_waveform(self, x, factor):
+        """Zoom the waveform strip in or out around a pixel position"""
+        if self.peaks is None:
+            return
+        start, end = self.waveform_range()
+        duration = self.duration()
+        anchor = start + x / max(1, self.waveform_canvas.winfo_width()) * (end - start)
+        
+        span = min(duration, max(0.5, (end - start) * factor))
+        start = max(0.0, min(anchor - (anchor - start) * span / (end - start), duration - span))
+        self.waveform_view = None if span >= duration else (start, start + span)
+        self.draw_waveform()
+    
     def on_window_resize(self, event):
         """Handle window resize event"""
         if event.widget == self.root:
@@ -660,17 +4239,68 @@ class VideoPlayer:
                 self.last_resize_time = current_time
                 if self.video is not None:
                     self.root.after(50, self.show_frame)
+                    
+                    # Cached loop frames are scaled for the old size, cache them again at the new one
+                    if self.loop_range is not None:
+                        self.root.after(300, self.rescale_loop_cache)
+    
+    def rescale_loop_cache(self):
+        if self.loop_range is not None and (self.loop_cache is None or self.loop_cache.canvas_size != self.renderer.canvas_size):
+            self.build_loop_cache()
     
     def __del__(self):
         # Clean up
-        self.stop_audio()
-        if self.temp_audio_file and os.path.exists(self.temp_audio_file):
-            try:
-                os.remove(self.temp_audio_file)
-            except:
-                pass
+        self.playback.close()
+        if self.loader is not None:
+            self.loader.cancel()
+        self.cancel_preload()
+        if self.exporter is not None:
+            self.exporter.cancel()
+        if self.decoder is not None:
+            self.decoder.close()
+        if self.audio_engine is not None:
+            self.audio_engine.close()
+        if self.audio_extractor is not None:
+            self.audio_extractor.cancel()
+        if self.peaks is not None:
+            self.peaks.cancel()
+        if self.shots is not None:
+            self.shots.cancel()
+        if self.loop_cache is not None:
+            self.loop_cache.cancel()
+        # The worker has quit, so the proxy decoder is closed directly
+        if self.proxy is not None:
+            self.proxy.cancel()
+        if self.proxy_decoder is not None:
+            self.proxy_decoder.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Staria Video Player")
+    parser.add_argument('video', nargs='?', help="video file to open")
+    parser.add_argument('--profile-startup', action='store_true', 
+                        help="print the time to window and to first frame per phase, then exit (status 1 if over budget)")
+    parser.add_argument('--json', metavar='PATH', help="with --profile-startup, also write the timeline to a JSON file")
+    args = parser.parse_args()
+    
+    startup = StartupProfile() if args.profile_startup else None
+    if startup is not None:
+        startup.mark('imported')
+    
     root = tk.Tk()
-    app = VideoPlayer(root)
-    root.mainloop()
\ No newline at end of file
+    if startup is not None:
+        startup.mark('tk ready')
+    app = VideoPlayer(root, startup=startup)
+    
+    if startup is not None:
+        root.update()
+        startup.mark('window shown')
+    if args.video:
+        app.open_path(args.video)
+    elif startup is not None:
+        app.finish_startup_profile()
+    root.mainloop()
+    
+    if startup is not None:
+        if args.json:
+            startup.export_json(args.json)
+        sys.exit(1 if startup.over_budget() else 0)
\ No newline at end of file